@@ -8,6 +8,7 @@ import yaml
 from .TheFractalBot import bot
 from .fractal import Fractal
 from .processing import SimpleCamera, Coloration
+from .processing.camera import parse_precise_complex
 from .processing.colors import hex2rgb
 from .processing.compute import timeit
 
@@ -74,24 +75,56 @@ def size_type(val: str):
 
 
 complex_type = click_type("complex")(complex)
+
+
+@click_type("complex")
+def precise_complex_type(val: str):
+    """Keep the text of the complex, as it may have more digits than a float."""
+    parse_precise_complex(val)
+    return val
+
+
 color_type = click_type(
     "color", hint="Must be in hexadecimal format or a common english name"
 )(hex2rgb)
 
 
-@click_type("coloration kind", hint="Coloration must be one of [C|A|T|S|I]")
+@click_type(
+    "coloration kind",
+    hint="Coloration must be one of [C|A|T|S|I|D] or the name of a coloring plugin.",
+)
 def enum_type(val):
+    from .processing.formulas import COLORINGS
+
+    if val in COLORINGS:
+        return val
+
     d = {
         "a": Coloration.ANGLE,
         "t": Coloration.TIME,
         "s": Coloration.SMOOTH_TIME,
         "i": Coloration.AVG_TRIANGLE_INEQUALITY,
         "c": Coloration.AVG_CURVATURE,
+        "d": Coloration.DISTANCE,
     }
 
     return d[val.lower()]
 
 
+@click_type("formula", hint="Formulas must be registered with --plugins.")
+def formula_type(val):
+    from .processing.formulas import FORMULAS
+
+    FORMULAS[val]
+    return val
+
+
+@click_type("address", hint="An address must be HOST:PORT.")
+def address_type(val: str):
+    host, _, port = val.rpartition(":")
+    return host or "localhost", int(port)
+
+
 @click_type("gradient", hint="A gradient must be hex colors separated by dashes.")
 def gradient_type(val: str):
     if val.endswith("-"):
@@ -145,6 +178,24 @@ verbose_option = click.option(
     help="Log level -v to -vvv can be passed.",
 )
 
+
+def register_plugins(ctx, param, files):
+    from .processing.formulas import load_plugins
+
+    for file in files:
+        load_plugins(file)
+
+
+plugins_option = click.option(
+    "--plugins",
+    type=click.File(),
+    multiple=True,
+    is_eager=True,
+    expose_value=False,
+    callback=register_plugins,
+    help="YAML file of formulas and colorings to register. Can be repeated.",
+)
+
 # ---- Definition of the command line interface ---- #
 
 
@@ -169,6 +220,69 @@ def gui():
         BrocoliApp().run()
 
 
+@cli.command()
+@verbose_option
+def warmup():
+    """Compile and cache the kernels, so that the next renders start fast."""
+
+    from .processing.compute import warmup as compile_kernels
+
+    click.echo(f"{'Kind':<30} {'Set':<10} {'Cold':>8} {'Warm':>8}")
+    total = 0
+    for kind, julia, periodicity, cold, warm in compile_kernels():
+        name = kind.value + " (periodic)" * periodicity
+        click.echo(f"{name:<30} {'julia' if julia else 'mandelbrot':<10} {cold:7.2f}s {warm:7.3f}s")
+        total += cold
+    click.echo(f"Total: {total:.2f}s")
+
+
+@cli.command()
+@click.argument("address", type=address_type)
+@click.option("--authkey", envvar="BROCOLI_AUTHKEY", required=True, help="Key of the farm.")
+@click.option("--threads", "-t", type=int, help="Threads of the kernels. All the cores by default.")
+@plugins_option
+@verbose_option
+def worker(address, authkey, threads):
+    """Compute tiles for the farm listening at ADDRESS, see gen --listen."""
+
+    from .farm import serve
+
+    serve(address, authkey.encode(), threads)
+
+
+@cli.command()
+@click.argument("center", type=precise_complex_type, default="-0.743+0.1318j")
+@click.option("--size", "-x", type=size_type, default="800x600")
+@click.option("--height", "-h", default=0.01, help="Complex height of the view.")
+@click.option("--limit", "-l", default=1000, help="Max number of steps for each point.")
+@click.option("--repeat", "-r", default=3, help="Keep the best time of this many renders.")
+@verbose_option
+def bench(center, size, height, limit, repeat):
+    """Time the engines that can compute each kind of coloration."""
+
+    from time import perf_counter
+    from .processing.compute import BATCHED_KINDS, Engine, compute
+
+    camera = SimpleCamera(size, center, height)
+    click.echo(f"{'Kind':<30} {'Engine':<16} {'Time':>8}")
+    for kind in Coloration:
+        engines = [Engine.TILES]
+        if kind in BATCHED_KINDS:
+            engines += [Engine.BATCHED, Engine.BATCHED_FLOAT32]
+        if kind is Coloration.DISTANCE:
+            engines.append(Engine.DISTANCE_FILL)
+
+        for engine in engines:
+            # The first render compiles the kernel
+            compute(camera, kind, limit=limit, engine=engine)
+            best = float("inf")
+            for _ in range(repeat):
+                start = perf_counter()
+                compute(camera, kind, limit=limit, engine=engine)
+                best = min(best, perf_counter() - start)
+            click.echo(f"{kind.value:<30} {engine.value:<16} {best:7.3f}s")
+
+
 @cli.command()
 @click.argument("size", type=size_type, default="1920x1080")
 @click.option("--seed", help="Seed for deterministic generation.")
@@ -209,13 +323,18 @@ def random(size, seed, show, output_file, yaml_file, dry):
 # TODO: Add bins
 
 @cli.command()
-@click.argument("center", type=complex_type, default=-0.75 + 0j)
+@click.argument("center", type=precise_complex_type, default="-0.75")
 @click.option("--size", "-x", type=size_type, default="1920x1080")
 @click.option("--zoom", "-z", default=1, help="Complex height is 3/2**zoom.")
 @click.option("--kind", "-k", type=enum_type, default="S")
 @click.option("--limit", "-l", default=256, help="Max number of steps for each point.")
 @click.option("--bound", "-b", default=200_000, help="Escape Module.")
 @click.option("--julia", "-j", type=complex_type, help="Julia seed.")
+@click.option(
+    "--periodicity", is_flag=True, help="Stop iterating periodic orbits. Faster inside."
+)
+@click.option("--formula", "-F", type=formula_type, help="Name of a formula from --plugins.")
+@plugins_option
 @click.option(
     "--normalize-quantiles", "-q", is_flag=True, help="Colors has the same area."
 )
@@ -231,6 +350,21 @@ def random(size, seed, show, output_file, yaml_file, dry):
 @click.option("--gradient-speed", "-s", default=1.0, help="Gradient speed.")
 @click.option("--gradient-offset", "-S", default=0.0, help="Gradient offset.")
 @click.option("--inside-color", "-i", type=color_type, help="Gradient offset.")
+@click.option(
+    "--antialias", "-a", default=1, help="Pixels on edges get AxA samples. 1 disables it."
+)
+@click.option(
+    "--antialias-threshold",
+    default=0.05,
+    help="Difference of normalized values between neighbours that makes an edge.",
+)
+@click.option("--workers", "-w", default=0, help="Render the tiles in this many local processes.")
+@click.option(
+    "--listen",
+    type=address_type,
+    help="Render the tiles with the workers that connect to HOST:PORT. See the worker command.",
+)
+@click.option("--authkey", envvar="BROCOLI_AUTHKEY", help="Key of the workers for --listen.")
 @click.option("--dry", "-d", is_flag=True, help="Print the fractal. Don't compute.")
 @click.option(
     "--yaml",
@@ -239,9 +373,12 @@ def random(size, seed, show, output_file, yaml_file, dry):
     help="Get parameters from a yaml file instead.",
 )
 @output_file_option
-def gen(dry, output_file, yaml_file, **kwargs):
+def gen(dry, output_file, yaml_file, workers, listen, authkey, **kwargs):
     """Generate a fractal image with a lot of parameters."""
 
+    if listen and not authkey:
+        raise click.UsageError("--listen needs an --authkey shared with the workers.")
+
     if yaml_file:
         fractal = yaml.full_load(yaml_file)
     else:
@@ -255,7 +392,15 @@ def gen(dry, output_file, yaml_file, **kwargs):
         print(fractal)
         return
 
-    image = fractal.render(True)
+    if workers or listen:
+        from .farm import Farm
+
+        address = listen or ("localhost", 0)
+        with Farm(address, authkey and authkey.encode()) as farm:
+            farm.start_workers(workers)
+            image = farm.render(fractal, True)
+    else:
+        image = fractal.render(True)
     save(image, output_file)
 
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Render a fractal on several processes or machines.
+
+A Farm splits the view of a fractal in tiles and sends them to the workers
+connected to it, each as the camera of the whole view and the window of the
+tile in it. The workers compute() their windows, which sample exactly the
+points of the whole view, and send back the raw values. Those are stitched
+together before the whole view is preprocessed and colored, so the render is
+the same as the one of a single machine.
+
+The workers are started on any machine with
+
+    brocoli worker HOST:PORT --authkey KEY
+
+and local ones with Farm.start_workers(). They connect to the farm, can
+join at any time, and get a new tile as soon as they sent the last one.
+The tiles of a worker that fails or disconnects are given to the others,
+up to `retries` times. A render fails when no worker is left to take its
+tiles. The formula and coloring plugins of the render are
+sent with its tiles and registered by the workers, see plugin_definitions().
+
+The messages are pickled over multiprocessing.connection, which checks the
+authkey before anything is unpickled.
+"""
+
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from .processing.camera import SimpleCamera
+
+__all__ = ["Farm", "serve", "split"]
+
+logger = logging.getLogger("brocoli")
+
+# Side of the tiles sent to the workers. Each is one compute() on a worker,
+# which splits it again between its threads.
+FARM_TILE_SIZE = 1024
+# How many times a tile is sent again after a failure
+DEFAULT_RETRIES = 3
+# Seconds a render waits for workers to connect when none is left
+DEFAULT_WAIT = 60
+# Seconds between two checks that some workers are left
+POLL_INTERVAL = 0.5
+
+
+def split(camera: SimpleCamera, tile_size=FARM_TILE_SIZE):
+    """
+    Split the view of the camera in tiles of at most tile_size pixels of side.
+
+    :return: a list of windows (x, y, w, h) for compute(), where (x, y) is
+        the top left pixel of the tile
+    """
+
+    w, h = camera.size
+    return [
+        (x, y, min(tile_size, w - x), min(tile_size, h - y))
+        for x in range(0, w, tile_size)
+        for y in range(0, h, tile_size)
+    ]
+
+
+def serve(address, authkey, threads=None):
+    """
+    Compute the tiles sent by the farm at the address, until it stops.
+
+    :param threads: number of threads of the kernels, all the cores by default
+    """
+
+    from numba import set_num_threads
+    from .processing.compute import compute
+    from .processing.formulas import register_definitions
+
+    if threads:
+        set_num_threads(threads)
+
+    with Client(address, authkey=authkey) as connection:
+        logger.info(f"Connected to the farm at {address}")
+        while True:
+            try:
+                job = connection.recv()
+            except EOFError:
+                return
+            if job is None:
+                return
+
+            camera, window, parameters, plugins = job
+            try:
+                register_definitions(plugins)
+                values = compute(camera, window=window, **parameters)
+            except Exception as error:
+                logger.exception(f"Failed to compute the window {window} of {camera}")
+                # the exceptions of numba are not all picklable
+                values = RuntimeError(f"{type(error).__name__}: {error}")
+
+            connection.send(values)
+
+
+@dataclass
+class _Render:
+    """The tiles of one call to Farm.compute()."""
+
+    # (tile, values) when a tile is done, (tile, exception) when it failed too often
+    results: queue.Queue = field(default_factory=queue.Queue)
+    cancelled: bool = False
+    # the plugins the tiles use, from plugin_definitions()
+    plugins: dict = None
+
+
+@dataclass
+class _Tile:
+    camera: SimpleCamera
+    window: tuple
+    parameters: dict
+    render: _Render
+    attempts: int = 0
+
+
+class Farm:
+    """
+    Coordinator of the workers that render the tiles.
+
+    Usage:
+        with Farm() as farm:
+            farm.start_workers(4)
+            image = farm.render(fractal)
+
+    :param address: (host, port) where the workers connect. The port 0 picks a free one.
+    :param authkey: bytes shared with the workers. A random one is drawn by
+        default, which only the local workers know.
+    :param retries: how many times a tile is sent again after a failure
+    :param wait: seconds a render waits for workers to connect when no worker
+        is connected and no local one is running. Without an authkey, no
+        other worker can connect and the render fails at once.
+    """
+
+    def __init__(
+        self, address=("localhost", 0), authkey=None, retries=DEFAULT_RETRIES, wait=DEFAULT_WAIT
+    ):
+        self.wait = wait if authkey else 0
+        self.authkey = authkey or os.urandom(16)
+        self.retries = retries
+        self.listener = Listener(address, authkey=self.authkey)
+        self.jobs = queue.Queue()
+        self.processes = []
+        # Number of workers connected
+        self.connected = 0
+        self._lock = threading.Lock()
+        logger.info(f"The farm listens at {self.address}")
+
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except AuthenticationError:
+                logger.warning("A worker tried to connect with the wrong authkey.")
+                continue
+            except OSError:
+                # the listener was closed
+                return
+
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        """Send the tiles to one worker, until the farm is closed or the worker is lost."""
+
+        with self._lock:
+            self.connected += 1
+        try:
+            self._send_tiles(connection)
+        finally:
+            with self._lock:
+                self.connected -= 1
+
+    def _send_tiles(self, connection):
+        with connection:
+            while True:
+                tile = self.jobs.get()
+                if tile is None:
+                    # leave the stop for the other workers
+                    self.jobs.put(None)
+                    try:
+                        connection.send(None)
+                    except OSError:
+                        pass
+                    return
+
+                if tile.render.cancelled:
+                    continue
+
+                try:
+                    connection.send((tile.camera, tile.window, tile.parameters, tile.render.plugins))
+                    values = connection.recv()
+                except (OSError, EOFError) as error:
+                    self._failed(tile, error)
+                    return
+
+                if isinstance(values, Exception):
+                    self._failed(tile, values)
+                else:
+                    tile.render.results.put((tile, values))
+
+    def _failed(self, tile, error):
+        tile.attempts += 1
+        logger.warning(f"The tile at {tile.window[:2]} failed ({tile.attempts} times): {error!r}")
+
+        if tile.attempts > self.retries:
+            tile.render.results.put((tile, error))
+        else:
+            self.jobs.put(tile)
+
+    def start_workers(self, count, threads=None):
+        """
+        Start workers in local processes.
+
+        :param threads: threads of each worker, by default the cores are shared between them
+        """
+
+        if threads is None:
+            threads = max(1, (os.cpu_count() or 1) // max(count, 1))
+
+        # forking a process that runs numba threads is not safe
+        context = get_context("spawn")
+        for _ in range(count):
+            process = context.Process(
+                target=serve, args=(self.address, self.authkey, threads), daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def compute(self, camera: SimpleCamera, tile_size=FARM_TILE_SIZE, **parameters):
+        """
+        Compute the view like compute() does, with the workers.
+
+        :param parameters: the other parameters of compute()
+        :raise RuntimeError: when a tile failed more than `retries` times
+        :raise ValueError: when a plugin cannot be sent to the workers
+        """
+
+        from .processing.formulas import plugin_definitions
+
+        plugins = plugin_definitions(parameters["kind"], parameters.get("formula"))
+        try:
+            pickle.dumps(plugins)
+        except Exception as error:
+            raise ValueError(
+                "The plugins must be expressions or functions that the workers can import."
+            ) from error
+
+        render = _Render(plugins=plugins)
+        # A plain copy of the camera is sent, which does not change meanwhile
+        view = SimpleCamera(camera.size, camera.center, camera.height)
+        view.precise_center = camera.precise_center
+        camera = view
+        tiles = split(camera, tile_size)
+        for window in tiles:
+            self.jobs.put(_Tile(camera, window, parameters, render))
+
+        out = np.empty(camera.size)
+        for _ in tiles:
+            tile, values = self._result(render)
+            if isinstance(values, Exception):
+                render.cancelled = True
+                raise RuntimeError(
+                    f"The tile at {tile.window[:2]} failed {tile.attempts} times."
+                ) from values
+
+            x, y, w, h = tile.window
+            out[x : x + w, y : y + h] = values
+            logger.debug(f"Got the tile at {x, y}")
+
+        return out
+
+    def _workers_left(self):
+        """Whether a worker is connected, or a local one may still connect."""
+        return self.connected > 0 or any(process.is_alive() for process in self.processes)
+
+    def _result(self, render):
+        """
+        The next (tile, values) of the render.
+
+        :raise RuntimeError: when no worker was left for `wait` seconds
+        """
+
+        alone_since = None
+        while True:
+            try:
+                return render.results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+            if self._workers_left():
+                alone_since = None
+                continue
+
+            if alone_since is None:
+                alone_since = time.monotonic()
+            if time.monotonic() - alone_since >= self.wait:
+                render.cancelled = True
+                raise RuntimeError("No worker is left to compute the tiles.")
+
+    def render(self, fractal, as_pillow_image=False, tile_size=FARM_TILE_SIZE):
+        """Render the Fractal, with its values computed by the workers."""
+
+        values = self.compute(fractal.camera, tile_size, **fractal.compute_parameters())
+        return fractal.render(as_pillow_image, values=values)
+
+    def close(self):
+        """Stop the workers and the listener."""
+
+        self.jobs.put(None)
+        self.listener.close()
+        for process in self.processes:
+            process.join(timeout=5)
@@ -1,28 +1,37 @@
+import logging
 from dataclasses import dataclass
 from typing import List, Union, Tuple
 
+import numpy as np
 import yaml
 from PIL import Image
 
+from .processing.antialias import find_edges, supersample
 from .processing.camera import SimpleCamera
 from .processing.colorize import colorize
 from .processing.colors import to_hex
-from .processing.compute import Coloration, compute
-from .processing.preprocess import preprocess
+from .processing.compute import Coloration, Engine, choose_engine, compute
+from .processing.preprocess import PreprocessStats, preprocess
 
 Color = Tuple[int, int, int]
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 
+logger = logging.getLogger("brocoli")
+
 
 @dataclass
 class Fractal(yaml.YAMLObject):
     # View
     camera: SimpleCamera
-    kind: Coloration = Coloration.SMOOTH_TIME
+    # A Coloration or the name of a coloring registered in processing.formulas
+    kind: Union[Coloration, str] = Coloration.SMOOTH_TIME
     limit: int = 128
     bound: int = 20_000
     julia: Union[None, complex] = None
+    periodicity: bool = False
+    # Name of a formula registered in processing.formulas, None for z^2 + c
+    formula: Union[None, str] = None
     # pre-processing
     normalize_quantiles: bool = False
     steps_power: float = 1.0
@@ -34,18 +43,57 @@ class Fractal(yaml.YAMLObject):
     gradient_speed: float = 1.0
     gradient_offset: float = 0.0
     inside_color: Union[None, Color] = None
+    # Anti-aliasing: the pixels on edges get antialias x antialias samples
+    antialias: int = 1
+    antialias_threshold: float = 0.05
 
     # Infos
     seed: str = None
     # For Yaml loading
     yaml_tag = "Fractal"
 
-    def render(self, as_pillow_image=False):
-        fractal = compute(
-            self.camera, self.kind, limit=self.limit, bound=self.bound, julia=self.julia
+    def compute_parameters(self):
+        """The parameters of compute() for this fractal, but the camera."""
+
+        return dict(
+            kind=self.kind,
+            limit=self.limit,
+            bound=self.bound,
+            julia=self.julia,
+            periodicity=self.periodicity,
+            formula=self.formula,
         )
-        fractal = preprocess(fractal, self.bins, self.normalize_quantiles, self.steps_power)
-        fractal = colorize(
+
+    def render(self, as_pillow_image=False, orbits=None, values=None):
+        """
+        Compute and color the fractal.
+
+        :param orbits: an OrbitStats shared by the renders of the same view
+            with several kinds, so that its orbits are iterated only once.
+            See compute().
+        :param values: the values of compute() for the camera, when they were
+            computed elsewhere, like by a Farm. They are colored as a whole.
+        """
+
+        fractal = values
+        if fractal is None:
+            fractal = compute(self.camera, **self.compute_parameters(), orbits=orbits)
+
+        if self.antialias > 1 and choose_engine(self.camera) is not Engine.TILES:
+            logger.warning("Anti-aliasing is not possible for zooms this deep.")
+        elif self.antialias > 1:
+            fractal = self.antialiased_colors(fractal)
+            return self._as_image(fractal, as_pillow_image)
+
+        fractal = self.preprocess(fractal)
+        fractal = self.colorize(fractal)
+        return self._as_image(fractal, as_pillow_image)
+
+    def preprocess(self, fractal):
+        return preprocess(fractal, self.bins, self.normalize_quantiles, self.steps_power)
+
+    def colorize(self, fractal):
+        return colorize(
             fractal,
             self.gradient_points,
             speed=self.gradient_speed,
@@ -55,6 +103,49 @@ class Fractal(yaml.YAMLObject):
             loop=self.gradient_loop,
         )
 
+    def antialiased_colors(self, fractal):
+        """
+        Colors of the fractal, with the pixels on edges averaged over more samples.
+
+        :param fractal: the values computed for the camera
+        """
+
+        # The field is only sorted when the quantiles or the bins of a small field need it
+        stats = PreprocessStats(fractal)
+        parameters = (self.bins, self.normalize_quantiles, self.steps_power)
+        pixels = stats.preprocess(*parameters)
+        edges = find_edges(pixels, self.antialias_threshold)
+        samples = supersample(
+            self.camera,
+            self.kind,
+            edges,
+            self.antialias,
+            limit=self.limit,
+            bound=self.bound,
+            julia=self.julia,
+            periodicity=self.periodicity,
+            formula=self.formula,
+        )
+        logger.debug(f"Supersampled {samples.shape[0]} of {fractal.size} pixels")
+
+        # The samples are on the edges, they are mapped with the statistics of
+        # the pixels so that they do not change the colors of the others
+        samples_values = stats.preprocess(*parameters, values=samples)
+        values = np.concatenate((pixels.ravel(), samples_values.ravel()))
+        colors = self.colorize(values)
+        # The colors may be int8, the average is taken on their bytes
+        dtype = colors.dtype
+        colors = colors.view(np.uint8)
+
+        image = colors[: fractal.size].reshape(fractal.shape + (3,))
+        samples = colors[fractal.size :].reshape(samples.shape + (3,))
+        total = image[edges] + samples.sum(axis=1, dtype=float)
+        image[edges] = np.round(total / (samples.shape[1] + 1))
+
+        return image.view(dtype)
+
+    @staticmethod
+    def _as_image(fractal, as_pillow_image):
         fractal = fractal.swapaxes(0, 1)
 
         if as_pillow_image:
@@ -65,12 +156,15 @@ class Fractal(yaml.YAMLObject):
     def as_dict(self):
         return dict(
             center=self.camera.center,
+            precise_center=self.camera.precise_center,
             height=self.camera.height,
             size=self.camera.size,
             kind=self.kind,
             limit=self.limit,
             bound=self.bound,
             julia=self.julia,
+            periodicity=self.periodicity,
+            formula=self.formula,
             normalize_quantiles=self.normalize_quantiles,
             steps_power=self.steps_power,
             bins=self.bins,
@@ -80,6 +174,8 @@ class Fractal(yaml.YAMLObject):
             gradient_speed=self.gradient_speed,
             gradient_offset=self.gradient_offset,
             inside_color=self.inside_color,
+            antialias=self.antialias,
+            antialias_threshold=self.antialias_threshold,
         )
 
 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Adaptive supersampling.
+
+Rendering at a higher resolution and downscaling costs the square of the
+factor everywhere, while aliasing only shows where neighbouring pixels have
+different colors. Here, the pixels whose preprocessed value differs from one
+of their neighbours by more than a threshold get k x k extra samples, on a
+jittered grid inside the pixel. The color of those pixels is the average
+color of their samples.
+
+The samples of the kinds in BATCHED_KINDS are iterated in lockstep, like
+with Engine.BATCHED, which makes the edges of a 800x600 view with 4 x 4
+samples five to ten times cheaper than rendering it four times larger.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+from .batched import escape_points
+from .camera import SimpleCamera
+from .compute import (
+    BATCHED_KINDS,
+    DEFAULT_BOUND,
+    CONSTANT_INSIDE_KINDS,
+    Coloration,
+    dynamic_scheduling,
+    escape_at,
+    escape_function,
+)
+
+__all__ = ["find_edges", "supersample"]
+
+
+def find_edges(values, threshold=0.05):
+    """
+    Pixels that differ from one of their four neighbours by more than threshold.
+
+    Pixels inside the set and outside it always differ.
+
+    :param values: preprocessed fractal, with values in [-1, 1]
+    :return: a boolean array of the shape of values
+    """
+
+    inside = values < 0
+    edges = np.zeros(values.shape, dtype=bool)
+    for axis in (0, 1):
+        differ = np.abs(np.diff(values, axis=axis)) > threshold
+        differ |= np.diff(inside, axis=axis)
+
+        before = [slice(None)] * 2
+        after = [slice(None)] * 2
+        before[axis] = slice(None, -1)
+        after[axis] = slice(1, None)
+        edges[tuple(before)] |= differ
+        edges[tuple(after)] |= differ
+
+    return edges
+
+
+@njit(cache=True)
+def _jitter(x, y, k):
+    """Pseudo-random number in [0, 1), the same for each pixel and sample in every render."""
+
+    n = (x * 73856093) ^ (y * 19349663) ^ (k * 83492791)
+    n = (n * 2654435761) % 4294967296
+    return n / 4294967296
+
+
+@njit(parallel=True, cache=True)
+def _sample_points(pixels, h, per_side, bottomleft, pixstep):
+    """The per_side x per_side samples of each of the pixels, given as (x, y)."""
+
+    out = np.empty((pixels.shape[0], per_side * per_side), np.complex128)
+    for p in prange(pixels.shape[0]):
+        x = pixels[p, 0]
+        y = pixels[p, 1]
+        for i in range(per_side):
+            for j in range(per_side):
+                s = i * per_side + j
+                dx = (i + _jitter(x, y, 2 * s)) / per_side - 0.5
+                dy = (j + _jitter(x, y, 2 * s + 1)) / per_side - 0.5
+                out[p, s] = bottomleft + pixstep * complex(x + dx, h - y - 1 + dy)
+    return out
+
+
+@njit(parallel=True, cache=True)
+def _supersample(out, points, escape_func, limit, bound, julia, check_inside):
+    """Write the value of the escape function at each of the points in out."""
+
+    for p in prange(points.shape[0]):
+        for s in range(points.shape[1]):
+            out[p, s] = escape_at(escape_func, points[p, s], limit, bound, julia, check_inside)[0]
+
+
+def supersample(
+    camera: SimpleCamera,
+    kind: Coloration,
+    mask,
+    per_side=4,
+    limit=50,
+    bound=DEFAULT_BOUND,
+    julia=None,
+    check_inside=True,
+    periodicity=False,
+    formula=None,
+):
+    """
+    Compute extra samples in the pixels of the mask.
+
+    The parameters are the same as compute(), with floats only.
+
+    :param mask: boolean array of the size of the camera, usually from find_edges()
+    :param per_side: each pixel gets per_side x per_side samples
+    :return: an array of shape (mask.sum(), per_side ** 2) with the values
+        of the samples, in the order of np.nonzero(mask).
+    """
+
+    assert tuple(camera.size) == mask.shape, "The mask and the camera have different sizes."
+
+    pixels = np.argwhere(mask)
+    points = _sample_points(pixels, mask.shape[1], per_side, camera.bottomleft, camera.step)
+    check_inside = check_inside and kind in CONSTANT_INSIDE_KINDS and formula is None
+
+    # The samples are on the edges, where the orbits are the longest: the
+    # lockstep kernel iterates them several times faster than the escape functions
+    if kind in BATCHED_KINDS and not periodicity and formula is None:
+        with dynamic_scheduling():
+            return escape_points(points, kind, limit, bound, julia, check_inside)
+
+    escape_func = escape_function(kind, periodicity, formula, julia is not None)
+    out = np.empty(points.shape)
+    with dynamic_scheduling():
+        _supersample(out, points, escape_func, limit, bound, julia, check_inside)
+
+    return out
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Lockstep iteration of many pixels at once.
+
+The escape functions iterate one complex at a time, with a square root in
+abs(z) and a branch at each iteration, which keeps the compiler from using
+SIMD instructions. Here, the pixels of a tile are iterated together with
+their real and imaginary parts in separate arrays. The inner loop has no
+branch and compares |z|^2 to bound^2, so it can be vectorized.
+
+Every BATCH_STEPS iterations, the pixels that escaped are written to the
+output and removed from the arrays, so the iterations only go to the pixels
+that are still inside.
+
+The arrays can be float32 for previews, which doubles the width of the SIMD
+instructions. With float64, the values are exactly the ones of the escape
+functions.
+"""
+
+from math import log
+from time import perf_counter
+
+import numpy as np
+from numba import njit, objmode, prange
+
+from .compute import BATCHED_KINDS, Coloration, in_main_components
+
+# Iterations between two removals of the escaped pixels
+BATCH_STEPS = 8
+
+
+@njit(cache=True)
+def _iterate(zr, zi, cr, ci, escaped, er, ei, active, first, steps, bound2):
+    """
+    Iterate the first `active` points of the batch `steps` times, from iteration `first`.
+
+    The iteration where a point escapes and its z then are written in
+    escaped, er and ei. Points keep being iterated after they escape.
+    """
+
+    for i in range(first, first + steps):
+        for j in range(active):
+            x = zr[j]
+            y = zi[j]
+            x, y = x * x - y * y + cr[j], 2 * x * y + ci[j]
+            zr[j] = x
+            zi[j] = y
+
+            r2 = x * x + y * y
+            new = (r2 > bound2) & (escaped[j] == 0)
+            escaped[j] = i if new else escaped[j]
+            er[j] = x if new else er[j]
+            ei[j] = y if new else ei[j]
+
+
+@njit(cache=True)
+def _remove(arrays, pixels, escaped, active, j):
+    """Replace the point j of the batch by the last active one."""
+
+    last = active - 1
+    for a in arrays:
+        a[j] = a[last]
+    pixels[j] = pixels[last]
+    escaped[j] = escaped[last]
+
+
+@njit(cache=True)
+def _escape_batch(values, zr, zi, cr, ci, active, smooth, limit, bound2, log_bound):
+    """
+    Write the escape time of each of the first `active` points of the batch in values.
+
+    The points are iterated from zr + i zi with the constants cr + i ci, and
+    are reordered in those arrays as they escape.
+    """
+
+    size = zr.size
+    er = np.zeros_like(zr)
+    ei = np.zeros_like(zr)
+    escaped = np.zeros(size, np.int32)
+    slots = np.arange(size)
+
+    first = 1
+    while active and first < limit:
+        steps = min(BATCH_STEPS, limit - first)
+        _iterate(zr, zi, cr, ci, escaped, er, ei, active, first, steps, bound2)
+        first += steps
+
+        j = 0
+        while j < active:
+            i = escaped[j]
+            if i == 0:
+                j += 1
+                continue
+
+            if smooth:
+                z = complex(er[j], ei[j])
+                values[slots[j]] = i + log(log_bound / log(abs(z))) / log(2)
+            else:
+                values[slots[j]] = i
+
+            _remove((zr, zi, cr, ci, er, ei), slots, escaped, active, j)
+            active -= 1
+
+    for j in range(active):
+        values[slots[j]] = -limit
+
+
+@njit(parallel=True, cache=True)
+def _compute_batched(
+    out,
+    smooth,
+    zero,
+    bottomleft,
+    pixstep,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    grid,
+    costs,
+    skipped,
+):
+    """
+    Same as _compute, for the escape time or the smooth escape time.
+
+    The batches are arrays of the type of `zero`.
+    """
+
+    w, h = out.shape
+    gx, gy, _, gh = grid
+    tiles_x = (w + tile_size - 1) // tile_size
+    bound2 = zero + bound * bound
+    log_bound = log(bound)
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+
+        if costs.size:
+            with objmode(start="float64"):
+                start = perf_counter()
+
+        size = tile_size * tile_size
+        zr = np.full(size, zero)
+        zi = np.full(size, zero)
+        cr = np.full(size, zero)
+        ci = np.full(size, zero)
+        pixels = np.empty(size, np.int64)
+
+        active = 0
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                z0 = bottomleft + pixstep * complex(gx + x, gh - (gy + y) - 1)
+                if julia is None and check_inside and in_main_components(z0):
+                    out[x, y] = -limit
+                    skipped[tile] += 1
+                    continue
+
+                c = z0 if julia is None else julia
+                zr[active] = z0.real
+                zi[active] = z0.imag
+                cr[active] = c.real
+                ci[active] = c.imag
+                pixels[active] = x * h + y
+                active += 1
+
+        values = np.empty(active)
+        _escape_batch(values, zr, zi, cr, ci, active, smooth, limit, bound2, log_bound)
+        for j in range(active):
+            out[pixels[j] // h, pixels[j] % h] = values[j]
+
+        if costs.size:
+            with objmode(end="float64"):
+                end = perf_counter()
+            costs[tile] = end - start
+
+
+# Like _compute_timed, it cannot be loaded from the disk cache
+_compute_batched_timed = njit(parallel=True)(_compute_batched.py_func)
+
+
+def compute_batched(
+    out,
+    camera,
+    kind,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    grid,
+    costs,
+    skipped,
+    single=False,
+):
+    """
+    Compute the view of the camera in out, with lockstep iterations.
+
+    This is used by compute() for the kinds in BATCHED_KINDS. The costs of
+    the tiles and the pixels skipped in each are written like with _compute.
+
+    :param single: iterate with float32 instead of float64, for previews.
+    """
+
+    assert kind in BATCHED_KINDS, f"There is no batched kernel for {kind}."
+
+    kernel = _compute_batched_timed if costs.size else _compute_batched
+    kernel(
+        out,
+        kind is Coloration.SMOOTH_TIME,
+        np.float32(0) if single else 0.0,
+        camera.bottomleft,
+        camera.step,
+        limit,
+        bound,
+        julia,
+        check_inside,
+        tile_size,
+        order,
+        grid,
+        costs,
+        skipped,
+    )
+
+    return out
+
+
+@njit(parallel=True, cache=True)
+def _escape_points(out, points, smooth, zero, limit, bound, julia, check_inside, batch_size):
+    """Same as _compute_batched, for the points of a flat array, batch_size at a time."""
+
+    bound2 = zero + bound * bound
+    log_bound = log(bound)
+    for k in prange((points.size + batch_size - 1) // batch_size):
+        start = k * batch_size
+        stop = min(start + batch_size, points.size)
+
+        zr = np.full(batch_size, zero)
+        zi = np.full(batch_size, zero)
+        cr = np.full(batch_size, zero)
+        ci = np.full(batch_size, zero)
+        indices = np.empty(batch_size, np.int64)
+
+        active = 0
+        for p in range(start, stop):
+            z0 = points[p]
+            if julia is None and check_inside and in_main_components(z0):
+                out[p] = -limit
+                continue
+
+            c = z0 if julia is None else julia
+            zr[active] = z0.real
+            zi[active] = z0.imag
+            cr[active] = c.real
+            ci[active] = c.imag
+            indices[active] = p
+            active += 1
+
+        values = np.empty(active)
+        _escape_batch(values, zr, zi, cr, ci, active, smooth, limit, bound2, log_bound)
+        for j in range(active):
+            out[indices[j]] = values[j]
+
+
+def escape_points(points, kind, limit, bound, julia, check_inside, batch_size=256, single=False):
+    """
+    The values of the kind at each of the points, with lockstep iterations.
+
+    This is compute_batched() for points anywhere, like the samples of
+    supersample(). The values are the ones of the escape functions.
+
+    :param points: array of complex starting points, of any shape.
+    :return: an array of the shape of points.
+    """
+
+    assert kind in BATCHED_KINDS, f"There is no batched kernel for {kind}."
+
+    points = np.ascontiguousarray(points, dtype=complex)
+    out = np.empty(points.shape)
+    _escape_points(
+        out.reshape(-1),
+        points.reshape(-1),
+        kind is Coloration.SMOOTH_TIME,
+        np.float32(0) if single else 0.0,
+        limit,
+        bound,
+        julia,
+        check_inside,
+        batch_size,
+    )
+
+    return out
@@ -1,12 +1,44 @@
+import re
+from decimal import Decimal, localcontext
+from math import ceil, log10
+
 import yaml
 
+_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+_COMPLEX = re.compile(rf"\(?\s*({_NUMBER})?\s*(?:({_NUMBER}|[+-])\s*j)?\s*\)?")
+
+
+def parse_precise_complex(text: str):
+    """
+    Parse a complex number written like python does, keeping all its digits.
+
+    :return: the real and imaginary parts as Decimals.
+    """
+
+    text = text.replace(" ", "")
+    match = _COMPLEX.fullmatch(text)
+    if not text or match is None:
+        raise ValueError(f"{text!r} is not a complex number.")
+
+    real, imag = match.groups()
+    if imag in ("+", "-"):
+        imag += "1"
+
+    return Decimal(real or 0), Decimal(imag or 0)
+
 
 class SimpleCamera(yaml.YAMLObject):
     yaml_tag = "SimpleCamera"
+    # The center with all its digits, as two strings, for zooms deeper than floats.
+    # It is only used while it matches the float center.
+    precise_center = None
 
     def __init__(self, size, center=0j, height=2, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.center = center
+        if isinstance(center, str):
+            self.set_precise_center(*parse_precise_complex(center))
+        else:
+            self.center = center
         self.height = height
         self.size = size
 
@@ -31,16 +63,59 @@ class SimpleCamera(yaml.YAMLObject):
     def bottomleft(self):
         return self.center - self.complex_size / 2
 
+    @property
+    def precision(self):
+        """Number of significant digits needed to tell the pixels apart."""
+        scale = max(abs(self.center), 1) / self.step
+        return max(17, ceil(log10(scale)) + 20)
+
+    @property
+    def decimal_center(self):
+        """The real and imaginary parts of the center, as Decimals."""
+
+        if self.precise_center is not None:
+            real, imag = map(Decimal, self.precise_center)
+            # The float center was changed without updating the precise one
+            if complex(float(real), float(imag)) == self.center:
+                return real, imag
+
+        return Decimal(self.center.real), Decimal(self.center.imag)
+
+    def set_precise_center(self, real, imag):
+        self.precise_center = [str(real), str(imag)]
+        self.center = complex(float(real), float(imag))
+
+    def move(self, offset):
+        """Move the center by a complex offset, without losing precision."""
+
+        if self.precise_center is None:
+            self.center += offset
+        else:
+            real, imag = self.decimal_center
+            with localcontext() as ctx:
+                ctx.prec = self.precision
+                self.set_precise_center(
+                    real + Decimal(offset.real), imag + Decimal(offset.imag)
+                )
+
+    def offset_at(self, pixel):
+        """Offset of the pixel from the center of the camera."""
+        return self.step * complex(
+            pixel[0] - self.size[0] / 2, self.size[1] / 2 - pixel[1]
+        )
+
     def complex_at(self, pixel):
         return self.bottomleft + self.step * complex(
             pixel[0], (self.size[1] - pixel[1])
         )
 
     def zoom(self, zoom, pixel):
-        before = self.complex_at(pixel)
+        # The point under the pixel does not move. Offsets are small
+        # and precise, unlike the absolute position of the pixels.
+        offset = self.offset_at(pixel)
         with self:
             self.height *= zoom
-            self.fix(pixel, before)
+            self.move(offset * (1 - zoom))
 
     def fix(self, pixel, c):
         self.center -= self.complex_at(pixel) - c
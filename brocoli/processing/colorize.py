@@ -20,7 +20,8 @@ def apply_gradient(surf: np.ndarray, gradient, speed=1.0, offset=0.0):
         to gradient[0]
     :return: An image of shape (m, n, 3) of int8.
     """
-    gradient = np.array(gradient, dtype=np.int8)
+    # The colors above 127 wrap around in the int8
+    gradient = np.array(gradient, dtype=np.uint8).view(np.int8)
 
     mini = np.nanmin(surf)
     maxi = np.nanmax(surf)
@@ -29,7 +30,7 @@ def apply_gradient(surf: np.ndarray, gradient, speed=1.0, offset=0.0):
     normalised *= len(gradient) - 1
     normalised[~np.isfinite(normalised)] = 0
 
-    out = gradient[normalised.astype(np.int)]
+    out = gradient[normalised.astype(int)]
 
     return out
 
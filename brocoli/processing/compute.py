@@ -1,27 +1,43 @@
 #!/usr/bin/env python3
+import hashlib
 import logging
 from cmath import phase
 from collections import deque
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
 from math import log, sin
-from time import time
+from pathlib import Path
+from time import time, perf_counter
 
+import numba
 import numpy as np
 import yaml
-from numba import njit, prange
+from numba import njit, prange, objmode
 import click
 
 from .camera import SimpleCamera
 
-__all__ = ["compute", "Coloration", "ESCAPE_FUNCTIONS"]
+__all__ = ["compute", "Coloration", "Engine", "ComputeStats", "ESCAPE_FUNCTIONS"]
 
 DEFAULT_BOUND = 200_000
+# An orbit that comes back closer than this to a previous point is periodic
+PERIOD_TOLERANCE = 1e-12
+# First iteration where the orbit is saved for periodicity checking
+PERIOD_CHECK_START = 8
+DEFAULT_TILE_SIZE = 16
+# Under those pixel sizes, relative to the center, floats and then
+# double-doubles cannot tell the pixels apart
+FLOAT_MIN_STEP = 1e-13
+DOUBLE_DOUBLE_MIN_STEP = 1e-28
+SUBDIVISION_TILE_SIZE = 64
 
 logger = logging.getLogger("brocoli")
 
 
-@njit
+@njit(cache=True)
 def lerp(a, b, t):
     """
     Linear interpolation between `a` and `b`.
@@ -32,14 +48,43 @@ def lerp(a, b, t):
     return a * (1.0 - t) + b * t
 
 
-@njit
+@njit(cache=True)
 def smooth_coef(z, bound):
     z = abs(z)
     d = 1 + 1 / log(2) * log(log(bound) / abs(log(z))) if z != 1 else 0
     return d
 
 
-@njit
+@njit(cache=True)
+def in_main_components(c):
+    """
+    Whether c is inside the main cardioid or the period-2 bulb of the Mandelbrot set.
+
+    Those points never escape, and they cover most of the inside of wide views.
+    """
+
+    x = c.real - 0.25
+    y2 = c.imag * c.imag
+    q = x * x + y2
+    if q * (q + x) <= 0.25 * y2:
+        return True
+    return (c.real + 1) * (c.real + 1) + y2 <= 0.0625
+
+
+def connected_julia(julia, limit, bound=DEFAULT_BOUND):
+    """
+    Whether the regions of escape time at least k are connected, for the Julia set of the seed.
+
+    They are for every k up to the limit as long as the orbit of 0 does not
+    escape, so for any seed in the Mandelbrot set. Otherwise the Julia set is dust, and a region of escape
+    time k can surround islands of higher escape times.
+    """
+
+    julia = complex(julia)
+    return in_main_components(julia) or escape(0j, julia, limit, bound) < 0
+
+
+@njit(cache=True)
 def f(z, c):
     # return z * z + -0.7487144+0.06478j
     # return z * z + 0.40925-0.21053j
@@ -47,7 +92,7 @@ def f(z, c):
     return z * z + c
 
 
-@njit
+@njit(cache=True)
 def escape(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
     z = z0
     for i in range(1, limit):
@@ -57,7 +102,7 @@ def escape(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
     return -limit
 
 
-@njit
+@njit(cache=True)
 def escape_smooth(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
     z = z0
     for i in range(1, limit):
@@ -67,26 +112,122 @@ def escape_smooth(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
     return -limit
 
 
-@njit
+# Periodicity checking, following Brent's cycle detection: the orbit is saved
+# at every power of two and each new point is compared to the saved one.
+# Once an orbit is periodic it will never escape, so we can stop early.
+
+
+@njit(cache=True)
+def escape_periodic(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    z = saved = z0
+    check = PERIOD_CHECK_START
+    for i in range(1, limit):
+        z = f(z, c)
+        if abs(z) > bound:
+            return i
+        if abs(z - saved) < PERIOD_TOLERANCE:
+            return -limit
+        if i == check:
+            saved = z
+            check *= 2
+    return -limit
+
+
+@njit(cache=True)
+def escape_smooth_periodic(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    z = saved = z0
+    check = PERIOD_CHECK_START
+    for i in range(1, limit):
+        z = f(z, c)
+        if abs(z) > bound:
+            return i + log(log(bound) / log(abs(z))) / log(2)
+        if abs(z - saved) < PERIOD_TOLERANCE:
+            return -limit
+        if i == check:
+            saved = z
+            check *= 2
+    return -limit
+
+
+@njit(cache=True)
 def escape_angle(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
-    z = z0
-    orbit = [z]
+    # sum of the orbit, kept as it goes instead of storing the orbit
+    z = s = z0
+    n = 1
 
     for i in range(1, limit):
         z = f(z, c)
-        orbit.append(z)
+        s += z
+        n += 1
 
         if abs(z) > 2:
             break
 
-    # transform orbit into value
-    s = 0j
-    for z in orbit:
-        s += z
-    return -abs(s) / len(orbit)
+    return -abs(s) / n
+
+
+@njit(cache=True)
+def _escape_distance(z0, c, limit, bound, dc):
+    # Lower bound of the distance to the set, from the derivative of z with
+    # respect to the pixel: no point of the set is closer, and it is at most
+    # four times further. dc is the derivative of c, 1 for the Mandelbrot
+    # set, where c is the pixel, and 0 for the Julia sets. This derivative is
+    # only right for z^2 + c, so the f of the escape functions is ignored, and
+    # it vanishes on the preimages of 0 of the Julia sets, where 0 is returned.
+    z = z0
+    dz = 1 + 0j
+    for i in range(1, limit):
+        dz = 2 * z * dz + dc
+        z = f(z, c)
+        absz = abs(z)
+        if absz > bound:
+            return 0.5 * absz * log(absz) / abs(dz) if dz != 0 else 0.0
+    return -limit
 
 
-@njit
+@njit(cache=True)
+def _escape_distance_periodic(z0, c, limit, bound, dc):
+    z = saved = z0
+    dz = 1 + 0j
+    check = PERIOD_CHECK_START
+    for i in range(1, limit):
+        dz = 2 * z * dz + dc
+        z = f(z, c)
+        absz = abs(z)
+        if absz > bound:
+            return 0.5 * absz * log(absz) / abs(dz) if dz != 0 else 0.0
+        if abs(z - saved) < PERIOD_TOLERANCE:
+            return -limit
+        if i == check:
+            saved = z
+            check *= 2
+    return -limit
+
+
+@njit(cache=True)
+def escape_distance(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    return _escape_distance(z0, c, limit, bound, 1.0)
+
+
+@njit(cache=True)
+def escape_distance_periodic(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    return _escape_distance_periodic(z0, c, limit, bound, 1.0)
+
+
+# The same for the Julia sets, where c does not move with the pixel
+
+
+@njit(cache=True)
+def escape_distance_julia(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    return _escape_distance(z0, c, limit, bound, 0.0)
+
+
+@njit(cache=True)
+def escape_distance_julia_periodic(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+    return _escape_distance_periodic(z0, c, limit, bound, 0.0)
+
+
+@njit(cache=True)
 def escape_smoothfire(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
     ln12 = 1 / log(2)
     lnbound = log(bound)
@@ -148,33 +289,42 @@ def escape_smoothfire(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
 #     return lerp(S1, S, d) * sign
 
 
-@njit
-def my_deque_push(deque, head, value):
-    deque[head] = value
-    head = (head + 1) % len(deque)
-    return head
+@njit(cache=True)
+def push_last(zs, value):
+    """Drop the first item of the tuple zs and append value."""
+    return zs[1:] + (value,)
 
 
-def addend(order):
+def addend(order, f=f):
+    """
+    Make an escape function that averages `t` over the orbit.
+
+    `t` receives the last `order` iterates of z -> f(z, c) in a tuple zs,
+    from the oldest one, and an index head such that zs[head - 1] is the last
+    one. f can also be given to the escape function as last argument.
+    The decorated function has a `periodic` attribute, a variant that stops
+    iterating periodic orbits, and keeps `t` and `order` as `term` and `order`.
+    """
+
+    assert order <= PERIOD_CHECK_START
+    zeros = (0j,) * order
+
     def decorator(t):
         t = njit(t)
 
         @njit
         def func(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
-            # last `order` iterates of the function
-            # Ideally we would like to use a deque but numba does
-            # not support them, so we will use a list and a end/start
-            # pointer. Which works fine, since the deque has constant size
-            # after order iterations
-            zs = [0j] * order
-            head = 0  # this is always a valid index one after the last pushed value
-            head = my_deque_push(zs, head, z0)
+            # last `order` iterates of the function. A tuple of constant
+            # size stays on the stack, while a list would be allocated for
+            # each pixel.
+            zs = push_last(zeros, z0)
+            head = 0  # the tuple is in order, so zs[head - 1] is the last iterate
             # partial sums
             s = s1 = i = 0
 
             sign = 1
             for i in range(limit):
-                head = my_deque_push(zs, head, f(zs[head - 1], c))
+                zs = push_last(zs, f(zs[head - 1], c))
 
                 if i >= order - 1:
                     s1, s = s, s + t(zs, head)
@@ -190,6 +340,60 @@ def addend(order):
             d = smooth_coef(zs[head - 1], bound)
             return lerp(S1, S, d) * sign
 
+        @njit
+        def periodic(z0, c, limit=50, bound=DEFAULT_BOUND, f=f):
+            # Same as func, but once the orbit is found periodic, we add the sum
+            # of one period for each cycle we skip instead of iterating them.
+            # Only the last cycles are iterated so s1 and the last z are exact.
+            zs = push_last(zeros, z0)
+            head = 0
+            s = s1 = 0.0
+
+            # no point is saved before the partial sums start
+            saved = complex(np.inf, 0)
+            saved_i = 0
+            saved_s = 0.0
+            check = PERIOD_CHECK_START
+            skipped = False
+
+            sign = -1
+            i = 0
+            while i < limit:
+                zs = push_last(zs, f(zs[head - 1], c))
+
+                if i >= order - 1:
+                    s1, s = s, s + t(zs, head)
+
+                z = zs[head - 1]
+                if abs(z) > bound:
+                    sign = 1
+                    break
+
+                if not skipped and abs(z - saved) < PERIOD_TOLERANCE:
+                    period = i - saved_i
+                    cycles = (limit - 1 - i) // period - 1
+                    if cycles > 0:
+                        s += (s - saved_s) * cycles
+                        i += cycles * period
+                    skipped = True
+                elif i == check:
+                    saved = z
+                    saved_i = i
+                    saved_s = s
+                    check *= 2
+
+                i += 1
+            else:
+                i = limit - 1
+
+            S = s / (i - order + 2) if i > order - 2 else 0
+            S1 = s1 / (i - order + 1) if i > order - 1 else 0
+            d = smooth_coef(zs[head - 1], bound)
+            return lerp(S1, S, d) * sign
+
+        func.periodic = periodic
+        func.term = t
+        func.order = order
         return func
 
     return decorator
@@ -209,6 +413,64 @@ def escape_stripe(zs, head):
     return 1 / 2 * sin(s * phase(zs[0])) + 1 / 2
 
 
+@lru_cache(maxsize=1)
+def source_fingerprint():
+    """
+    Hash of the version of brocoli and of the sources of this package.
+
+    Numba only checks the file of a cached kernel, not the ones of the
+    functions it calls from other files, so this is part of their identity.
+    """
+
+    digest = hashlib.sha1()
+    try:
+        digest.update(version("brocoli").encode())
+    except PackageNotFoundError:
+        pass
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def set_identity(func, identity):
+    """
+    Give this identity to a compiled function, instead of a random one.
+
+    This uses a private method of the numba dispatchers. When it is not
+    there, or the function already has an identity, the kernels that get
+    the function as argument are compiled again in each process.
+
+    :return: whether the identity was set.
+    """
+
+    try:
+        func._set_uuid(identity)
+    except (AttributeError, AssertionError):
+        logger.debug(f"Cannot set the identity of {func}, its kernels will not be cached.")
+        return False
+    return True
+
+
+def stable_identities(functions, prefix):
+    """
+    Give the compiled functions of the dict the same identity in every process.
+
+    The kernels that get a compiled function as argument, like _compute with the
+    escape functions, are cached on disk under the identity of this function.
+    Numba draws it at random, so those kernels would miss the cache in every
+    new process. The keys of the dict must be Colorations.
+
+    The identities change with source_fingerprint(), so an edit or an upgrade
+    of brocoli compiles the kernels again. The functions must thus only call
+    numba, numpy and this package: a kernel would still load the code of an
+    older version of any other function.
+    """
+
+    fingerprint = source_fingerprint()
+    for kind, func in functions.items():
+        set_identity(func, f"brocoli.{prefix}.{kind.name}.{fingerprint}")
+
+
 class Coloration(Enum):
     TIME = "escape time"
     SMOOTH_TIME = "smooth escape time"
@@ -216,6 +478,7 @@ class Coloration(Enum):
     AVG_TRIANGLE_INEQUALITY = "average triangle inequality"
     AVG_CURVATURE = "average curvature"
     AVG_STRIDE = "stride coloring"
+    DISTANCE = "distance estimation"
 
 
 ESCAPE_FUNCTIONS = {
@@ -225,27 +488,214 @@ ESCAPE_FUNCTIONS = {
     Coloration.AVG_TRIANGLE_INEQUALITY: escape_smoothfire,
     Coloration.AVG_CURVATURE: escape_curvature,
     Coloration.AVG_STRIDE: escape_stripe,
+    Coloration.DISTANCE: escape_distance,
 }
 
 
-@njit(parallel=True)
-def _compute(out, escape_func, bottomleft, pixstep, limit, bound=100_000.0, julia=None):
+class Engine(Enum):
+    TILES = "tiles"
+    SUBDIVISION = "subdivision"
+    PERTURBATION = "perturbation"
+    DOUBLE_DOUBLE = "double-double"
+    BATCHED = "batched"
+    BATCHED_FLOAT32 = "batched float32"
+    DISTANCE_FILL = "distance fill"
+
+
+# Variants of the escape functions that stop early on periodic orbits
+PERIODIC_ESCAPE_FUNCTIONS = {
+    Coloration.TIME: escape_periodic,
+    Coloration.SMOOTH_TIME: escape_smooth_periodic,
+    Coloration.AVG_CURVATURE: escape_curvature.periodic,
+    Coloration.AVG_STRIDE: escape_stripe.periodic,
+    Coloration.DISTANCE: escape_distance_periodic,
+}
+
+# Variants of the escape functions for the Julia sets, when they differ
+JULIA_ESCAPE_FUNCTIONS = {
+    Coloration.DISTANCE: escape_distance_julia,
+}
+JULIA_PERIODIC_ESCAPE_FUNCTIONS = {
+    Coloration.DISTANCE: escape_distance_julia_periodic,
+}
+
+stable_identities(ESCAPE_FUNCTIONS, "escape")
+stable_identities(PERIODIC_ESCAPE_FUNCTIONS, "periodic")
+stable_identities(JULIA_ESCAPE_FUNCTIONS, "julia")
+stable_identities(JULIA_PERIODIC_ESCAPE_FUNCTIONS, "julia_periodic")
+
+# Kinds whose value is -limit everywhere inside the set. Only those can be
+# found without iterating the inside, by subdivision or in_main_components().
+CONSTANT_INSIDE_KINDS = {Coloration.TIME, Coloration.SMOOTH_TIME, Coloration.DISTANCE}
+# Kinds that Engine.BATCHED can compute
+BATCHED_KINDS = {Coloration.TIME, Coloration.SMOOTH_TIME}
+
+
+@dataclass
+class ComputeStats:
+    """
+    Informations collected by compute() about a render.
+
+    Pass an instance to compute() and it is filled during the render.
+    """
+
+    tile_size: int = 0
+    # time in seconds spent on each tile, of shape (tiles_x, tiles_y)
+    tile_costs: np.ndarray = None
+    # number of pixels whose value was found without iterating them
+    skipped: int = 0
+    # number of those that were in the main cardioid or the period-2 bulb
+    main_components: int = 0
+    # iterations skipped by series approximation, for perturbation
+    series_skip: int = 0
+    # number of pixels that glitched and were rebased, for perturbation
+    rebases: int = 0
+
+    def summary(self):
+        """Short description of how evenly the work was split between the tiles."""
+
+        if self.tile_costs is None or self.tile_costs.size == 0:
+            return "no tile costs recorded"
+
+        costs = self.tile_costs
+        total = costs.sum()
+        mean = costs.mean()
+        spread = costs.std() / mean if mean > 0 else 0
+        return (
+            f"{costs.size} tiles of {self.tile_size}px, total {total:.3}s, "
+            f"mean {mean * 1000:.3}ms, max {costs.max() * 1000:.3}ms, "
+            f"spread {spread:.2}"
+        )
+
+
+@lru_cache(maxsize=16)
+def tile_order(tile_count):
+    """
+    Order in which the tiles are handed to the threads.
+
+    Numba splits a prange in contiguous chunks, so neighbouring tiles, which have
+    similar costs, would end up on the same thread. Shuffling the tiles gives
+    every thread a sample of the whole image, hence the same amount of work.
+    """
+
+    return np.random.RandomState(tile_count).permutation(tile_count)
+
+
+@njit(cache=True)
+def escape_at(escape_func, z0, limit, bound, julia, check_inside):
+    """
+    Value of the escape function at z0, for the Mandelbrot or the Julia set.
+
+    :return: the value and whether the point was found in the main cardioid
+        or period-2 bulb without iterating it.
+    """
+
+    if julia is not None:
+        return escape_func(z0, julia, limit, bound), False
+    if check_inside and in_main_components(z0):
+        return -limit, True
+    return escape_func(z0, z0, limit, bound), False
+
+
+@njit(parallel=True, cache=True)
+def _compute(
+    out,
+    escape_func,
+    bottomleft,
+    pixstep,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    grid,
+    costs,
+    skipped,
+):
     """
     Compute the escape time of each points of the surf.
 
     The camera is positioned with bottomleft and the zoom with pixstep.
     Limits is the maximum number of iterations.
+    The surface is split in squares of `tile_size` pixels, computed in the given
+    `order`. If `costs` is not empty, the time spent on each tile is written in it.
+    When `check_inside` is set, the points of the main cardioid and period-2 bulb
+    are set to -limit without iteration and counted in `skipped`, per tile.
+    `grid` is (x0, y0, width, height): out[x, y] is the pixel (x0 + x, y0 + y)
+    of the view, which has width x height pixels.
     """
 
     w, h = out.shape
-    for x in prange(w):
-        for y in range(h):
-            z0 = bottomleft + pixstep * complex(x, h - y - 1)
+    gx, gy, _, gh = grid
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
 
-            if julia is None:
-                out[x, y] = escape_func(z0, z0, limit, bound)
-            else:
-                out[x, y] = escape_func(z0, julia, limit, bound)
+        if costs.size:
+            with objmode(start="float64"):
+                start = perf_counter()
+
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                z0 = bottomleft + pixstep * complex(gx + x, gh - (gy + y) - 1)
+                out[x, y], inside = escape_at(escape_func, z0, limit, bound, julia, check_inside)
+                skipped[tile] += inside
+
+        if costs.size:
+            with objmode(end="float64"):
+                end = perf_counter()
+            costs[tile] = end - start
+
+
+# Numba cannot load the kernels whose pranges switch to object mode from its
+# disk cache, so the ones that time their tiles are compiled in each process
+_compute_timed = njit(parallel=True)(_compute.py_func)
+
+
+def choose_engine(camera):
+    """The engine that can render the view of the camera precisely enough."""
+
+    step = camera.step / max(abs(camera.center), 1)
+    if step < DOUBLE_DOUBLE_MIN_STEP:
+        return Engine.PERTURBATION
+    if step < FLOAT_MIN_STEP:
+        return Engine.DOUBLE_DOUBLE
+    return Engine.TILES
+
+
+def escape_function(kind, periodicity=False, formula=None, julia=False):
+    """
+    The escape function that computes the kind.
+
+    :param kind: a Coloration, or the name of a coloring registered in formulas.
+    :param periodicity: the variant that stops iterating periodic orbits, if any.
+    :param formula: the name of a formula registered in formulas, or None
+        for z -> z^2 + c.
+    :param julia: the variant for the Julia sets, if any.
+    """
+
+    if formula is not None or not isinstance(kind, Coloration):
+        from .formulas import plugin_escape_function
+
+        assert kind is not Coloration.DISTANCE, "Distance estimation only works with z^2 + c."
+
+        return plugin_escape_function(kind, formula, periodicity)
+
+    periodic = periodicity and kind in PERIODIC_ESCAPE_FUNCTIONS
+    if julia and kind in JULIA_ESCAPE_FUNCTIONS:
+        return (JULIA_PERIODIC_ESCAPE_FUNCTIONS if periodic else JULIA_ESCAPE_FUNCTIONS)[kind]
+    return (PERIODIC_ESCAPE_FUNCTIONS if periodic else ESCAPE_FUNCTIONS)[kind]
+
+
+def dynamic_scheduling():
+    """Ask numba to hand out the iterations of pranges one by one, when it can."""
+
+    if hasattr(numba, "parallel_chunksize"):
+        return numba.parallel_chunksize(1)
+    return nullcontext()
 
 
 def compute(
@@ -255,6 +705,14 @@ def compute(
     limit=50,
     bound=DEFAULT_BOUND,
     julia=None,
+    tile_size=None,
+    stats: ComputeStats = None,
+    engine: Engine = None,
+    check_inside=True,
+    periodicity=False,
+    formula=None,
+    orbits=None,
+    window=None,
 ):
     """
     Compute the view of the Mandelbrot set defined by the camera.
@@ -264,28 +722,271 @@ def compute(
     This is a convenience function for _compute.
 
     :param limits: maximum number of iterations
-    :param kind: type of coloration function
+    :param kind: type of coloration function, or the name of a coloring
+        registered in formulas
     :param out: out array. If none is specified a new one is made.
+    :param tile_size: side of the square tiles distributed to the threads
+    :param stats: a ComputeStats to fill with the cost of each tile
+    :param engine: Engine.SUBDIVISION fills the areas of constant value
+        without iterating them, only for the kinds in CONSTANT_INSIDE_KINDS,
+        and for Julia sets only when connected_julia() is true.
+        Engine.PERTURBATION is for zooms deeper than floats, and uses
+        camera.precise_center if it is set. Engine.DOUBLE_DOUBLE is cheaper,
+        for zooms down to about 1e-28. Engine.BATCHED iterates many pixels
+        at once for the kinds in BATCHED_KINDS, without periodicity checking,
+        and Engine.BATCHED_FLOAT32 does it faster and less precisely, for
+        previews. Both fill the stats like Engine.TILES.
+        Engine.DISTANCE_FILL interpolates the areas far from the set for
+        Coloration.DISTANCE, see distance.py. It is only used when
+        asked for, since its values are not the exact ones that ViewCache
+        and compute_progressive() rely on. By default, the engine is chosen
+        depending on the zoom by choose_engine(), and is Engine.BATCHED when
+        it can be used instead of Engine.TILES, which gives the same result.
+    :param check_inside: skip the iteration of the points in the main cardioid
+        and period-2 bulb. Only for the kinds in CONSTANT_INSIDE_KINDS.
+    :param periodicity: stop iterating the orbits that become periodic.
+        Only for the kinds in PERIODIC_ESCAPE_FUNCTIONS, ignored for the others.
+    :param formula: name of a formula registered in formulas, to iterate
+        instead of z -> z^2 + c. Those are only computed with Engine.TILES.
+    :param orbits: an OrbitStats, from orbit_stats.py. The statistics of the
+        orbits of the view are recorded in it, unless it already holds them,
+        and the values of the kind are derived from them. Any other kind of
+        the view is then given by orbits.values() without iterating again.
+        If it holds the view with a lower limit, only the pixels that did not
+        escape are iterated further. Only for the Colorations and z^2 + c,
+        with floats, and the engine, check_inside and periodicity are ignored.
+    :param window: (x, y, w, h) to only compute the pixels [x, x + w) x [y, y + h)
+        of the view, in an out array of size (w, h). They sample exactly the
+        points of the whole view. Engine.SUBDIVISION and Engine.DISTANCE_FILL
+        use tiles instead, and the orbits cannot be used.
     :return: a ndarray of dimension :camera.size: with the values of the
         coloring function on each complex point inside the frame.
         If :out: is not None, then the return array is out.
     """
 
+    # The position of out in the pixels of the view, see _compute
+    if window is None:
+        grid = (0, 0, *camera.size)
+        size = tuple(camera.size)
+    else:
+        x, y, w, h = window
+        assert 0 <= x and x + w <= camera.size[0] and 0 <= y and y + h <= camera.size[1], (
+            f"The window {window} is not in the view of {camera.size}."
+        )
+        grid = (x, y, *camera.size)
+        size = (w, h)
+
     if out is None:
         # apparently we cannot create a numpy array of dynamic size inside a numba-compiled
         # function, so we create it here if needed
-        out = np.empty(camera.size)
+        out = np.empty(size)
     else:
         assert (
-            tuple(camera.size) == out.shape
-        ), f"The camera and out array have different sizes. {camera.size} != {out.shape}"
-
-    escape_func = ESCAPE_FUNCTIONS[kind]
-    _compute(out, escape_func, camera.bottomleft, camera.step, limit, bound, julia)
+            size == out.shape
+        ), f"The camera and out array have different sizes. {size} != {out.shape}"
+
+    batched = (Engine.BATCHED, Engine.BATCHED_FLOAT32)
+    plugin = formula is not None or not isinstance(kind, Coloration)
+    if plugin and engine not in (None, Engine.TILES):
+        logger.warning(f"{engine} cannot compute formulas and colorings, using tiles instead.")
+        engine = Engine.TILES
+    elif plugin:
+        if choose_engine(camera) is not Engine.TILES:
+            logger.warning("Formulas and colorings are computed with floats, the view is too deep.")
+        engine = Engine.TILES
+
+    if orbits is not None:
+        assert window is None, "The orbits are recorded for the whole view."
+        assert not plugin, "The orbits are only recorded for z^2 + c and the Colorations."
+        if not orbits.holds(camera, limit, bound, julia) and choose_engine(camera) is not Engine.TILES:
+            logger.warning("Orbits are recorded with floats, the view is too deep.")
+
+        if orbits.can_resume(camera, limit, bound, julia):
+            orbits.resume(camera, limit)
+        elif not orbits.holds(camera, limit, bound, julia):
+            orbits.record(camera, limit, bound, julia)
+        return orbits.values(kind, out)
+
+    if engine is None:
+        engine = choose_engine(camera)
+        if engine is Engine.TILES and kind in BATCHED_KINDS and not periodicity:
+            engine = Engine.BATCHED
+
+    if kind is Coloration.DISTANCE and engine in (Engine.PERTURBATION, Engine.DOUBLE_DOUBLE):
+        logger.warning("Distance estimation is computed with floats, the view is too deep.")
+        engine = Engine.TILES
+
+    if engine in batched and kind not in BATCHED_KINDS:
+        logger.warning(f"There is no batched kernel for {kind}, using tiles instead.")
+        engine = Engine.TILES
+
+    if engine is Engine.SUBDIVISION and kind not in CONSTANT_INSIDE_KINDS:
+        logger.warning(f"Subdivision does not work with {kind}, using tiles instead.")
+        engine = Engine.TILES
+
+    if engine is Engine.SUBDIVISION and julia is not None and not connected_julia(julia, limit, bound):
+        logger.warning(f"The Julia set of {julia} is not connected, using tiles instead of subdivision.")
+        engine = Engine.TILES
+
+    if engine is Engine.DISTANCE_FILL and kind is not Coloration.DISTANCE:
+        logger.warning(f"The distance fill does not work with {kind}, using tiles instead.")
+        engine = Engine.TILES
+
+    subdivided = (Engine.SUBDIVISION, Engine.DISTANCE_FILL)
+    if engine in subdivided and window is not None:
+        logger.warning(f"The window of a view cannot be computed with {engine}, using tiles instead.")
+        engine = Engine.TILES
+
+    if tile_size is None:
+        tile_size = SUBDIVISION_TILE_SIZE if engine in subdivided else DEFAULT_TILE_SIZE
+    assert tile_size >= 1, "Tiles must be at least one pixel wide."
 
+    w, h = out.shape
+    tiles = (-(-w // tile_size), -(-h // tile_size))
+    order = tile_order(tiles[0] * tiles[1])
+    if engine is Engine.PERTURBATION:
+        from .perturbation import compute_perturbation
+
+        return compute_perturbation(
+            out, camera, kind, limit, bound, julia, tile_size, order, grid, stats
+        )
+
+    if engine is Engine.DOUBLE_DOUBLE:
+        from .doubledouble import compute_double_double
+
+        return compute_double_double(out, camera, kind, limit, bound, julia, tile_size, order, grid)
+
+    costs = np.zeros(tiles[0] * tiles[1] if stats is not None else 0)
+    skipped = np.zeros(order.size, dtype=np.int64)
+    # The main cardioid and bulb are only known for z^2 + c
+    check_inside = check_inside and kind in CONSTANT_INSIDE_KINDS and formula is None
+
+    if engine in batched:
+        from .batched import compute_batched
+
+        single = engine is Engine.BATCHED_FLOAT32
+        with dynamic_scheduling():
+            compute_batched(
+                out,
+                camera,
+                kind,
+                limit,
+                bound,
+                julia,
+                check_inside,
+                tile_size,
+                order,
+                grid,
+                costs,
+                skipped,
+                single,
+            )
+        record_tiles(stats, tile_size, tiles, costs, skipped, engine)
+        return out
+
+    escape_func = escape_function(kind, periodicity, formula, julia is not None)
+
+    if engine in subdivided:
+        if engine is Engine.SUBDIVISION:
+            from .subdivision import _compute_subdivision as kernel
+        else:
+            from .distance import _compute_distance_fill as kernel
+
+        done = np.zeros(out.shape, dtype=bool)
+        filled = np.zeros(order.size, dtype=np.int64)
+        with dynamic_scheduling():
+            kernel(
+                out,
+                done,
+                escape_func,
+                camera.bottomleft,
+                camera.step,
+                limit,
+                bound,
+                julia,
+                check_inside,
+                tile_size,
+                order,
+                filled,
+                skipped,
+            )
+
+        if stats is not None:
+            stats.tile_size = tile_size
+            stats.main_components = int(skipped.sum())
+            stats.skipped = int(filled.sum()) + stats.main_components
+            logger.debug(
+                "%s skipped %s pixels, %s in the main cardioid and bulb",
+                engine.value.capitalize(),
+                stats.skipped,
+                stats.main_components,
+            )
+        return out
+
+    kernel = _compute if stats is None else _compute_timed
+    with dynamic_scheduling():
+        kernel(
+            out,
+            escape_func,
+            camera.bottomleft,
+            camera.step,
+            limit,
+            bound,
+            julia,
+            check_inside,
+            tile_size,
+            order,
+            grid,
+            costs,
+            skipped,
+        )
+
+    record_tiles(stats, tile_size, tiles, costs, skipped, engine)
     return out
 
 
+def record_tiles(stats, tile_size, tiles, costs, skipped, engine):
+    """Fill the stats, if any, with the costs and skipped pixels of the tiles of _compute."""
+
+    if stats is None:
+        return
+
+    stats.tile_size = tile_size
+    # tiles are numbered row by row
+    stats.tile_costs = costs.reshape((tiles[1], tiles[0])).T
+    stats.main_components = stats.skipped = int(skipped.sum())
+    logger.debug("%s: %s", engine.value.capitalize(), stats.summary())
+    logger.debug("Skipped %s pixels in the main cardioid and bulb", stats.skipped)
+
+
+def warmup():
+    """
+    Compile the kernels of compute() for every kind, for the Mandelbrot and Julia sets.
+
+    Numba caches the compiled kernels on disk, in __pycache__ or in the
+    NUMBA_CACHE_DIR, so that the next processes only load them, until
+    brocoli changes, see stable_identities().
+
+    :return: a list of (kind, julia, periodicity, cold, warm) with the time in
+        seconds of the first compute(), which compiles or loads the kernel, and
+        of the second one.
+    """
+
+    camera = SimpleCamera((32, 32))
+    times = []
+    for kind in Coloration:
+        for julia in (None, -0.8 + 0.156j):
+            for periodicity in (False, True)[: 1 + (kind in PERIODIC_ESCAPE_FUNCTIONS)]:
+                durations = []
+                for _ in range(2):
+                    start = perf_counter()
+                    compute(camera, kind, julia=julia, periodicity=periodicity)
+                    durations.append(perf_counter() - start)
+                times.append((kind, julia is not None, periodicity, *durations))
+
+    return times
+
+
 @contextmanager
 def timeit(text=""):
     t = time()
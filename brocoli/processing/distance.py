@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Exterior fill with distance estimation.
+
+Coloration.DISTANCE gives, for each point outside the set, a lower bound of its
+distance to the set: the disc of this radius around the point contains no
+point of the set. When a rectangle of pixels fits in the disc of each of its
+corners, it is well outside the set, where the distance varies smoothly, and
+it is filled by bilinear interpolation of its corners without iterating it.
+
+The inside of the set, where the value is -limit, is filled like in
+subdivision.py when the whole border of a rectangle is inside. The tiles are
+split in rectangles down to rectangles small enough to be iterated pixel by
+pixel. On wide views, most of the outside is filled from a few corners. The
+filled values of the outside are an interpolation, and Engine.TILES gives the
+exact ones. They differ by less than 2% on wide views of the Mandelbrot set
+and of connected Julia sets.
+"""
+
+from math import sqrt
+
+import numpy as np
+from numba import njit, prange
+
+from .compute import lerp
+from .subdivision import MIN_RECT_SIZE, STACK_SIZE, _midpoints_uniform, _pixel
+
+# A rectangle is filled when its diagonal is at most this times the distance of each corner
+FILL_RATIO = 0.5
+
+
+@njit(cache=True)
+def _border_uniform(
+    out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x0, y0, x1, y1, value
+):
+    """Whether the pixels on the border of the rectangle all have the given value."""
+
+    args = (out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside)
+    uniform = True
+    for x in range(x0, x1 + 1):
+        uniform = uniform and _pixel(*args, x, y0) == value and _pixel(*args, x, y1) == value
+    for y in range(y0 + 1, y1):
+        uniform = uniform and _pixel(*args, x0, y) == value and _pixel(*args, x1, y) == value
+    return uniform
+
+
+@njit(cache=True)
+def _fill(
+    out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x0, y0, x1, y1
+):
+    """
+    Compute the rectangle of pixels [x0, x1] x [y0, y1] (inclusive) of out.
+
+    The pixels found in the main cardioid and bulb are counted in skipped[0].
+    :return: the number of pixels that were filled without iterating them.
+    """
+
+    args = (out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside)
+    stack = np.empty((STACK_SIZE, 4), np.int64)
+    stack[0] = x0, y0, x1, y1
+    top = 1
+    filled = 0
+
+    while top:
+        top -= 1
+        x0, y0, x1, y1 = stack[top]
+
+        a = _pixel(*args, x0, y0)
+        b = _pixel(*args, x1, y0)
+        c = _pixel(*args, x0, y1)
+        d = _pixel(*args, x1, y1)
+
+        if x1 - x0 < 2 and y1 - y0 < 2:
+            # the corners are the whole rectangle
+            continue
+
+        diagonal = pixstep * sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
+        outside = min(a, b, c, d) * FILL_RATIO >= diagonal
+        inside = (
+            a == b == c == d < 0
+            and _border_uniform(*args, x0, y0, x1, y1, a)
+            and _midpoints_uniform(
+                escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x0, y0, x1, y1, out.shape[1], a
+            )
+        )
+
+        if outside or inside:
+            for x in range(x0, x1 + 1):
+                u = (x - x0) / (x1 - x0) if x1 > x0 else 0.0
+                for y in range(y0, y1 + 1):
+                    if not done[x, y]:
+                        v = (y - y0) / (y1 - y0) if y1 > y0 else 0.0
+                        out[x, y] = a if inside else lerp(lerp(a, b, u), lerp(c, d, u), v)
+                        done[x, y] = True
+                        filled += 1
+        elif x1 - x0 <= MIN_RECT_SIZE and y1 - y0 <= MIN_RECT_SIZE:
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    _pixel(*args, x, y)
+        elif x1 - x0 >= y1 - y0:
+            # Split along the longest side, the two halves share the middle line
+            mid = (x0 + x1) // 2
+            stack[top] = x0, y0, mid, y1
+            stack[top + 1] = mid, y0, x1, y1
+            top += 2
+        else:
+            mid = (y0 + y1) // 2
+            stack[top] = x0, y0, x1, mid
+            stack[top + 1] = x0, mid, x1, y1
+            top += 2
+
+    return filled
+
+
+@njit(parallel=True, cache=True)
+def _compute_distance_fill(
+    out,
+    done,
+    escape_func,
+    bottomleft,
+    pixstep,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    filled,
+    skipped,
+):
+    """
+    Same as _compute_subdivision, for the distance estimation.
+
+    `done` is a boolean array of the shape of `out`, initially False, and the
+    number of pixels filled without iteration in each tile is written in `filled`.
+    """
+
+    w, h = out.shape
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        x1 = min(x0 + tile_size, w) - 1
+        y1 = min(y0 + tile_size, h) - 1
+
+        filled[tile] = _fill(
+            out,
+            done,
+            skipped[tile : tile + 1],
+            escape_func,
+            bottomleft,
+            pixstep,
+            limit,
+            bound,
+            julia,
+            check_inside,
+            x0,
+            y0,
+            x1,
+            y1,
+        )
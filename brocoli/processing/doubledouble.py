@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Double-double arithmetic, for zooms a bit too deep for floats.
+
+A double-double is an unevaluated sum hi + lo of two floats, with |lo| smaller
+than half an ulp of hi. It has about 32 significant digits, which is enough
+for zooms down to about 1e-28, at a fixed cost of around ten float operations
+per operation, without the setup of perturbation.
+
+The orbit of each pixel is iterated with double-doubles and its coloration is
+computed from the float part by the ORBIT_REDUCTIONS.
+"""
+
+from decimal import Decimal, localcontext
+
+import numpy as np
+from numba import njit, prange
+
+from .orbits import ORBIT_REDUCTIONS
+
+# 2**27 + 1, to split a float in two halves of 26 bits
+SPLITTER = 134217729.0
+
+
+@njit(cache=True)
+def two_sum(a, b):
+    """a + b as a double-double, exactly."""
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+
+@njit(cache=True)
+def quick_two_sum(a, b):
+    """Same as two_sum, when |a| >= |b|."""
+    s = a + b
+    return s, b - (s - a)
+
+
+@njit(cache=True)
+def split(a):
+    t = SPLITTER * a
+    hi = t - (t - a)
+    return hi, a - hi
+
+
+@njit(cache=True)
+def two_prod(a, b):
+    """a * b as a double-double, exactly."""
+    p = a * b
+    ah, al = split(a)
+    bh, bl = split(b)
+    return p, ((ah * bh - p) + ah * bl + al * bh) + al * bl
+
+
+@njit(cache=True)
+def dd_add(ah, al, bh, bl):
+    s, e = two_sum(ah, bh)
+    return quick_two_sum(s, e + al + bl)
+
+
+@njit(cache=True)
+def dd_mul(ah, al, bh, bl):
+    p, e = two_prod(ah, bh)
+    return quick_two_sum(p, e + ah * bl + al * bh)
+
+
+@njit(cache=True)
+def _dd_orbit(orbit, zr, zrl, zi, zil, cr, crl, ci, cil, limit, radius):
+    """
+    Write the orbit of z -> z^2 + c from z0 in orbit, with double-doubles.
+
+    The orbit stops after the first point outside the radius or at z_limit.
+    :return: the number of points of the orbit.
+    """
+
+    k = 0
+    orbit[0] = complex(zr, zi)
+    for k in range(1, limit + 1):
+        r2, r2l = dd_mul(zr, zrl, zr, zrl)
+        i2, i2l = dd_mul(zi, zil, zi, zil)
+        ri, ril = dd_mul(zr, zrl, zi, zil)
+
+        zr, zrl = dd_add(r2, r2l, -i2, -i2l)
+        zr, zrl = dd_add(zr, zrl, cr, crl)
+        zi, zil = dd_add(2 * ri, 2 * ril, ci, cil)
+
+        orbit[k] = complex(zr, zi)
+        if zr * zr + zi * zi > radius * radius:
+            break
+
+    return k + 1
+
+
+@njit(parallel=True, cache=True)
+def _compute_double_double(
+    out, reduction, center, center_lo, pixstep, limit, bound, radius, julia, tile_size, order, grid
+):
+    """
+    Same as _compute, with double-double iterations.
+
+    The center of the camera is center + center_lo, both complex.
+    """
+
+    w, h = out.shape
+    gx, gy, gw, gh = grid
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        orbit = np.empty(limit + 1, np.complex128)
+
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                # The offset to the center is small, so it is precise as a float
+                delta = pixstep * complex(gx + x - gw / 2, gh / 2 - (gy + y) - 1)
+                zr, zrl = dd_add(center.real, center_lo.real, delta.real, 0.0)
+                zi, zil = dd_add(center.imag, center_lo.imag, delta.imag, 0.0)
+
+                if julia is None:
+                    n = _dd_orbit(orbit, zr, zrl, zi, zil, zr, zrl, zi, zil, limit, radius)
+                    c = complex(zr, zi)
+                else:
+                    n = _dd_orbit(
+                        orbit, zr, zrl, zi, zil, julia.real, 0.0, julia.imag, 0.0, limit, radius
+                    )
+                    c = julia
+
+                out[x, y] = reduction(orbit, 0, n, c, limit, bound)
+
+
+def compute_double_double(out, camera, kind, limit, bound, julia, tile_size, order, grid):
+    """
+    Compute the view of the camera in out, with double-double precision.
+
+    This is used by compute() and supports every kind of Coloration but DISTANCE.
+    """
+
+    real, imag = camera.decimal_center
+    with localcontext() as ctx:
+        ctx.prec = 40
+        center = complex(float(real), float(imag))
+        center_lo = complex(
+            float(real - Decimal(center.real)), float(imag - Decimal(center.imag))
+        )
+
+    _compute_double_double(
+        out,
+        ORBIT_REDUCTIONS[kind],
+        center,
+        center_lo,
+        camera.step,
+        limit,
+        bound,
+        max(bound, 2.0),
+        julia,
+        tile_size,
+        order,
+        grid,
+    )
+
+    return out
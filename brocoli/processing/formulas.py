@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Formulas and colorings registered at run time.
+
+A formula replaces z -> z^2 + c, and a coloring averages a term over the
+orbit, like the ones made with compute.addend. Both can be registered from
+Python, or from a YAML file of expressions:
+
+    formulas:
+      cubic: z ** 3 + c
+      burning ship: complex(abs(z.real), abs(z.imag)) ** 2 + c
+    colorings:
+      spiral:
+        order: 1
+        term: 0.5 * sin(8 * phase(zs[head - 1])) + 0.5
+
+The terms see the last `order` iterates in the tuple zs, the last one at
+zs[head - 1].
+
+Each formula and coloring gives an escape function, and _compute compiles a
+kernel for each. The escape functions are identified by a hash of the source
+of their formula and coloring, and of source_fingerprint() for brocoli: they
+are kept in memory, and numba finds their kernels in its disk cache in the
+next processes, see _specialise(). The functions that a formula or a term
+calls are not part of the hash, so the kernels are only compiled again for
+their changes when the cache is removed.
+"""
+
+import cmath
+import hashlib
+import importlib.util
+import inspect
+import math
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import FunctionType
+
+import yaml
+from numba import njit
+
+from .compute import (
+    ESCAPE_FUNCTIONS,
+    PERIODIC_ESCAPE_FUNCTIONS,
+    Coloration,
+    addend,
+    f,
+    set_identity,
+    source_fingerprint,
+)
+
+__all__ = [
+    "register_formula",
+    "register_coloring",
+    "load_plugins",
+    "plugin_definitions",
+    "register_definitions",
+    "FORMULAS",
+    "COLORINGS",
+]
+
+_FUNCTIONS = "exp log sqrt sin cos tan sinh cosh tanh".split()
+# What the expressions can use. The functions are complex in the formulas
+# and real in the terms of the colorings.
+FORMULA_NAMES = dict(
+    abs=abs,
+    complex=complex,
+    pi=math.pi,
+    e=math.e,
+    phase=cmath.phase,
+    **{name: getattr(cmath, name) for name in _FUNCTIONS},
+)
+COLORING_NAMES = dict(FORMULA_NAMES, **{name: getattr(math, name) for name in _FUNCTIONS})
+
+
+@dataclass(frozen=True)
+class Formula:
+    name: str
+    source: str
+    # compiled function of z and c
+    func: object
+    # the expression or function it was registered with
+    definition: object = None
+
+
+@dataclass(frozen=True)
+class Coloring:
+    name: str
+    source: str
+    order: int
+    # escape function made with addend
+    escape_func: object
+    # the expression or function it was registered with
+    definition: object = None
+
+
+FORMULAS = {}
+COLORINGS = {}
+# The escape functions already made, by hash
+_escape_functions = {}
+
+
+def _from_expression(expression, arguments, names):
+    source = f"def expression({arguments}):\n    return {expression}\n"
+    # numba imports the module of the functions it loads from its cache
+    namespace = dict(names, __name__=__name__)
+    exec(compile(source, "<expression>", "exec"), namespace)
+    return namespace["expression"]
+
+
+def _source(func):
+    """Source of a python function, or its bytecode when the source is not available."""
+
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return func.__code__.co_code.hex()
+
+
+def register_formula(name, formula):
+    """
+    Iterate z -> formula(z, c) in the fractals with this formula name.
+
+    :param formula: a function of z and c that numba can compile, or an
+        expression of z and c, like "z ** 3 + c".
+    """
+
+    if isinstance(formula, str):
+        source = formula
+        func = _from_expression(formula, "z, c", FORMULA_NAMES)
+    else:
+        func = getattr(formula, "py_func", formula)
+        source = _source(func)
+
+    FORMULAS[name] = Formula(name, source, njit(func), formula)
+    return FORMULAS[name]
+
+
+def register_coloring(name, term, order=1):
+    """
+    Add a coloring that averages `term` over the orbit, like compute.addend.
+
+    It can then be used as the kind of a fractal, with its name.
+
+    :param term: a function of the last `order` iterates zs and of head, that
+        numba can compile, or an expression of zs and head.
+    """
+
+    if isinstance(term, str):
+        source = term
+        func = _from_expression(term, "zs, head", COLORING_NAMES)
+    else:
+        func = getattr(term, "py_func", term)
+        source = _source(func)
+
+    COLORINGS[name] = Coloring(name, source, order, addend(order)(func), term)
+    return COLORINGS[name]
+
+
+def load_plugins(stream):
+    """Register the formulas and colorings of a YAML file, as in the module documentation."""
+
+    plugins = yaml.safe_load(stream) or {}
+
+    for name, expression in plugins.get("formulas", {}).items():
+        register_formula(name, str(expression))
+
+    for name, coloring in plugins.get("colorings", {}).items():
+        register_coloring(name, str(coloring["term"]), coloring.get("order", 1))
+
+
+def plugin_definitions(kind, formula=None):
+    """
+    What registers the coloring of the kind, if it is one, and the formula in another process.
+
+    The expressions are sent as they are, and the functions are pickled by
+    reference, so they must be importable where they are registered.
+    :return: a dict for register_definitions()
+    """
+
+    definitions = dict(formulas={}, colorings={})
+    if formula is not None:
+        definitions["formulas"][formula] = FORMULAS[formula].definition
+    if not isinstance(kind, Coloration):
+        coloring = COLORINGS[kind]
+        definitions["colorings"][kind] = (coloring.definition, coloring.order)
+    return definitions
+
+
+def register_definitions(definitions):
+    """Register the plugins of plugin_definitions(), unless they already are."""
+
+    for name, definition in definitions["formulas"].items():
+        if name not in FORMULAS or FORMULAS[name].definition != definition:
+            register_formula(name, definition)
+
+    for name, (definition, order) in definitions["colorings"].items():
+        coloring = COLORINGS.get(name)
+        if coloring is None or (coloring.definition, coloring.order) != (definition, order):
+            register_coloring(name, definition, order)
+
+
+# The escape functions are written in modules there, so that numba can cache their kernels
+KERNELS_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "brocoli" / "kernels"
+
+KERNEL_TEMPLATE = """\
+# Escape function of brocoli plugins, made by brocoli.processing.formulas for
+{key}
+# base is set before the module runs.
+from numba import njit
+
+
+@njit(cache=True)
+def escape_func(z0, c, limit, bound):
+    return base(z0, c, limit, bound)
+"""
+
+
+def _with_formula(escape_func, formula):
+    """Copy of the escape function that iterates the formula by default."""
+
+    py_func = escape_func.py_func
+    code = py_func.__code__
+    assert code.co_varnames[code.co_argcount - 1] == "f", "f must be the last argument."
+
+    defaults = py_func.__defaults__[:-1] + (formula,)
+    return njit(FunctionType(code, py_func.__globals__, py_func.__name__, defaults, py_func.__closure__))
+
+
+def _specialise(base, formula, key, digest):
+    """
+    Escape function that calls base with the formula.
+
+    Numba cannot cache the kernels that call a function made at run time
+    through a closure, but it can when the function is a global of a module.
+    The escape function is thus defined in a module of KERNELS_DIR, written
+    the first time and named after the digest of the key. Some kernels
+    still cannot be cached when the formula is passed as an argument, so it
+    becomes the default f of a copy of base, like z^2 + c is for the others.
+    """
+
+    path = KERNELS_DIR / f"plugin_{digest}.py"
+    if not path.exists():
+        KERNELS_DIR.mkdir(parents=True, exist_ok=True)
+        commented = "\n".join("#     " + line for line in key.splitlines())
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_text(KERNEL_TEMPLATE.format(key=commented))
+        temporary.replace(path)
+
+    spec = importlib.util.spec_from_file_location(f"brocoli_plugin_{digest}", path)
+    module = importlib.util.module_from_spec(spec)
+    module.base = _with_formula(base, formula)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    escape_func = module.escape_func
+    set_identity(escape_func, f"brocoli.plugin.{digest}")
+    return escape_func
+
+
+def plugin_escape_function(kind, formula=None, periodicity=False):
+    """
+    Escape function for a kind and a formula, made the first time it is needed.
+
+    :param kind: a Coloration or the name of a registered coloring
+    :param formula: the name of a registered formula, or None for z^2 + c
+    :param periodicity: use the variant that stops on periodic orbits, if any
+    """
+
+    if isinstance(kind, Coloration):
+        periodic = periodicity and kind in PERIODIC_ESCAPE_FUNCTIONS
+        base = (PERIODIC_ESCAPE_FUNCTIONS if periodic else ESCAPE_FUNCTIONS)[kind]
+        kind_source = kind.name
+    else:
+        coloring = COLORINGS[kind]
+        periodic = periodicity
+        base = coloring.escape_func.periodic if periodic else coloring.escape_func
+        kind_source = f"{coloring.order}\n{coloring.source}"
+
+    if formula is None:
+        func, formula_source = f, "z * z + c"
+    else:
+        func, formula_source = FORMULAS[formula].func, FORMULAS[formula].source
+
+    # The base and the kernels that call it change with brocoli
+    key = f"{formula_source}\n{kind_source}\n{periodic}\n{source_fingerprint()}"
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    if digest not in _escape_functions:
+        _escape_functions[digest] = _specialise(base, func, key, digest)
+
+    return _escape_functions[digest]
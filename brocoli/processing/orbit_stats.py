@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Record the orbits once, and derive every kind of coloration from them.
+
+The kinds of Coloration all iterate the same orbit and only differ in what
+they sum along it. Here, a single pass over the orbit of each pixel keeps, in
+a structured array, the iteration where it escaped, the last z and the
+accumulators of every kind. Each kind is then derived from this buffer for
+the cost of one operation per pixel, with the same values as its escape
+function, so changing the kind of a view does not iterate it again.
+
+The records also keep the last iterates and the state of each accumulator,
+so that a higher limit only goes on with the pixels that had not escaped.
+
+This holds for z^2 + c and the kinds of Coloration, without periodicity
+checking, with floats.
+"""
+
+from math import log
+
+import numpy as np
+from numba import njit, prange
+
+from .camera import SimpleCamera
+from .compute import (
+    DEFAULT_BOUND,
+    DEFAULT_TILE_SIZE,
+    ESCAPE_FUNCTIONS,
+    CONSTANT_INSIDE_KINDS,
+    Coloration,
+    dynamic_scheduling,
+    in_main_components,
+    lerp,
+    smooth_coef,
+    stable_identities,
+    tile_order,
+)
+
+__all__ = ["OrbitStats", "ORBIT_STATS"]
+
+_curvature = ESCAPE_FUNCTIONS[Coloration.AVG_CURVATURE]
+_stripe = ESCAPE_FUNCTIONS[Coloration.AVG_STRIDE]
+CURVATURE_TERM = _curvature.term
+CURVATURE_ORDER = _curvature.order
+STRIPE_TERM = _stripe.term
+STRIPE_ORDER = _stripe.order
+
+# The records keep the last three iterates, for the terms of the addend kinds
+assert CURVATURE_ORDER == 3 and STRIPE_ORDER == 1
+
+ORBIT_STATS = np.dtype(
+    [
+        # first iteration where |z| > bound, up to limit, 0 if none yet, and
+        # -1 if the point is in the main cardioid or bulb and was not iterated
+        ("escaped", np.int64),
+        # z at this iteration, or z_limit, and the two iterates before it
+        ("z", np.complex128),
+        ("z1", np.complex128),
+        ("z2", np.complex128),
+        # derivative of z with respect to the pixel, up to the escape
+        ("dz", np.complex128),
+        # sum and number of the points of the orbit until |z| > 2
+        ("angle_sum", np.complex128),
+        ("angle_count", np.int64),
+        ("angle_done", np.bool_),
+        # partial sums of AVG_TRIANGLE_INEQUALITY, before and after the last
+        # point, and the last |z| it saw
+        ("fire_s", np.float64),
+        ("fire_s1", np.float64),
+        ("fire_abs", np.float64),
+        # partial sums of the addend kinds, before and after the last point
+        ("curvature_s", np.float64),
+        ("curvature_s1", np.float64),
+        ("stripe_s", np.float64),
+        ("stripe_s1", np.float64),
+    ],
+    align=True,
+)
+
+# The kinds that need more than the escape iteration and the last z, in the
+# order of the channels given to the kernels
+CHANNEL_KINDS = (
+    Coloration.ANGLE,
+    Coloration.AVG_TRIANGLE_INEQUALITY,
+    Coloration.AVG_CURVATURE,
+    Coloration.AVG_STRIDE,
+    Coloration.DISTANCE,
+)
+
+
+@njit(cache=True)
+def _start(stats, z0):
+    """Set the record to the orbit of z0 before its first iteration."""
+
+    stats.escaped = 0
+    stats.z = z0
+    stats.z1 = 0j
+    stats.z2 = 0j
+    stats.dz = 1 + 0j
+    stats.angle_sum = z0
+    stats.angle_count = 1
+    stats.angle_done = False
+    stats.fire_s = 0.0
+    stats.fire_s1 = 0.0
+    stats.fire_abs = abs(z0)
+    stats.curvature_s = 0.0
+    stats.curvature_s1 = 0.0
+    stats.stripe_s = 0.0
+    stats.stripe_s1 = 0.0
+
+
+@njit(cache=True)
+def _iterate(stats, z0, c, dc, start, limit, bound, channels):
+    """
+    Go on with the orbit of the record from the iteration start up to limit.
+
+    Every accumulator follows the loop of its escape function. With a limit
+    L, the escape and the addend kinds see the iterates up to z_L, and the
+    other kinds up to z_{L-1}. The record of a limit can thus go on to a
+    higher one from start = L, and gives the same statistics as if it was
+    recorded with the higher limit, as long as the angle stopped before the
+    escape. The channels say which of CHANNEL_KINDS are recorded, and dc is
+    the derivative of c with respect to the pixel, see _escape_distance.
+    """
+
+    angle, fire, curvature, stripe, distance = channels
+
+    absc = abs(c)
+
+    escaped = stats.escaped
+    z = stats.z
+    z1 = stats.z1
+    z2 = stats.z2
+    dz = stats.dz
+    angle_sum = stats.angle_sum
+    angle_count = stats.angle_count
+    angle_done = stats.angle_done
+    fire_s = stats.fire_s
+    fire_s1 = stats.fire_s1
+    fire_abs = stats.fire_abs
+    curvature_s = stats.curvature_s
+    curvature_s1 = stats.curvature_s1
+    stripe_s = stats.stripe_s
+    stripe_s1 = stats.stripe_s1
+
+    i = start
+    absz = abs(z)
+    while True:
+        # z is z_i, which the escape and the addend kinds already saw
+        if 1 <= i < limit:
+            if distance:
+                dz = 2 * z1 * dz + dc
+
+            if angle and not angle_done:
+                angle_sum += z
+                angle_count += 1
+                angle_done = absz > 2
+
+            if fire:
+                fire_s1 = fire_s
+                zc = abs(z - c)
+                m = abs(zc - absc)
+                M = zc + absc
+                if i > 1 and M != m:
+                    fire_s += (absz - m) / (M - m)
+                fire_abs = absz
+
+        if escaped or i >= limit:
+            break
+
+        i += 1
+        z2, z1, z = z1, z, z * z + c
+
+        # The addend kinds see z_i at their iteration i - 1
+        if curvature and i - 1 >= CURVATURE_ORDER - 1:
+            curvature_s1, curvature_s = curvature_s, curvature_s + CURVATURE_TERM((z2, z1, z), 0)
+        if stripe and i - 1 >= STRIPE_ORDER - 1:
+            stripe_s1, stripe_s = stripe_s, stripe_s + STRIPE_TERM((z,), 0)
+
+        absz = abs(z)
+        if absz > bound:
+            escaped = i
+
+    # With a bound under 2, the angle goes on after the escape
+    w = z
+    while angle and not angle_done and i < limit - 1:
+        i += 1
+        w = w * w + c
+        angle_sum += w
+        angle_count += 1
+        angle_done = abs(w) > 2
+
+    stats.escaped = escaped
+    stats.z = z
+    stats.z1 = z1
+    stats.z2 = z2
+    stats.dz = dz
+    stats.angle_sum = angle_sum
+    stats.angle_count = angle_count
+    stats.angle_done = angle_done
+    stats.fire_s = fire_s
+    stats.fire_s1 = fire_s1
+    stats.fire_abs = fire_abs
+    stats.curvature_s = curvature_s
+    stats.curvature_s1 = curvature_s1
+    stats.stripe_s = stripe_s
+    stats.stripe_s1 = stripe_s1
+
+
+@njit(parallel=True, cache=True)
+def _iterate_view(
+    buffer, bottomleft, pixstep, start, limit, bound, julia, channels, check_inside, tile_size, order
+):
+    """
+    Record the statistics of the orbit of each pixel in buffer, by tiles like _compute.
+
+    With start = 0, the records are started from the pixels. Otherwise, they
+    hold the orbits up to the limit start, and only those that did not escape
+    before it go on.
+    """
+
+    w, h = buffer.shape
+    tiles_x = (w + tile_size - 1) // tile_size
+    # c moves with the pixel only for the Mandelbrot set
+    dc = 1.0 if julia is None else 0.0
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                stats = buffer[x, y]
+                z0 = bottomleft + pixstep * complex(x, h - y - 1)
+                c = z0 if julia is None else julia
+
+                if start == 0:
+                    _start(stats, z0)
+                    if check_inside and julia is None and in_main_components(z0):
+                        stats.escaped = -1
+                if stats.escaped == 0 or stats.escaped == start:
+                    _iterate(stats, z0, c, dc, start, limit, bound, channels)
+
+
+# The values of each kind, computed as its escape function does from the statistics
+
+
+@njit(cache=True)
+def _time(stats, limit, bound):
+    if 0 < stats.escaped < limit:
+        return stats.escaped
+    return -limit
+
+
+@njit(cache=True)
+def _smooth_time(stats, limit, bound):
+    if 0 < stats.escaped < limit:
+        return stats.escaped + log(log(bound) / log(abs(stats.z))) / log(2)
+    return -limit
+
+
+@njit(cache=True)
+def _angle(stats, limit, bound):
+    return -abs(stats.angle_sum) / stats.angle_count
+
+
+@njit(cache=True)
+def _smoothfire(stats, limit, bound):
+    ln12 = 1 / log(2)
+    lnbound = log(bound)
+
+    if 0 < stats.escaped < limit:
+        i = stats.escaped
+        sign = 1
+    else:
+        i = limit - 1
+        sign = -1
+
+    s = stats.fire_s
+    s1 = stats.fire_s1
+    absz = stats.fire_abs
+    d = 1 + ln12 * log(lnbound / abs(log(absz))) if absz != 1 else 0
+    S = s / (i - 1) if i > 1 else 0
+    S1 = s1 / (i - 2) if i > 2 else 0
+    return lerp(S1, S, d) * sign
+
+
+@njit(cache=True)
+def _addend(stats, s, s1, order, limit, bound):
+    """Value of an escape function made with compute.addend, from its partial sums."""
+
+    if 0 < stats.escaped <= limit:
+        i = stats.escaped - 1
+        sign = 1
+    else:
+        i = limit - 1
+        sign = -1
+
+    S = s / (i - order + 2) if i > order - 2 else 0
+    S1 = s1 / (i - order + 1) if i > order - 1 else 0
+    d = smooth_coef(stats.z, bound)
+    return lerp(S1, S, d) * sign
+
+
+@njit(cache=True)
+def _curvature_value(stats, limit, bound):
+    return _addend(stats, stats.curvature_s, stats.curvature_s1, CURVATURE_ORDER, limit, bound)
+
+
+@njit(cache=True)
+def _stripe_value(stats, limit, bound):
+    return _addend(stats, stats.stripe_s, stats.stripe_s1, STRIPE_ORDER, limit, bound)
+
+
+@njit(cache=True)
+def _distance(stats, limit, bound):
+    if 0 < stats.escaped < limit:
+        absz = abs(stats.z)
+        dz = stats.dz
+        return 0.5 * absz * log(absz) / abs(dz) if dz != 0 else 0.0
+    return -limit
+
+
+STATS_VALUES = {
+    Coloration.TIME: _time,
+    Coloration.SMOOTH_TIME: _smooth_time,
+    Coloration.ANGLE: _angle,
+    Coloration.AVG_TRIANGLE_INEQUALITY: _smoothfire,
+    Coloration.AVG_CURVATURE: _curvature_value,
+    Coloration.AVG_STRIDE: _stripe_value,
+    Coloration.DISTANCE: _distance,
+}
+
+stable_identities(STATS_VALUES, "stats")
+
+
+@njit(parallel=True, cache=True)
+def _values(out, buffer, value, limit, bound):
+    w, h = buffer.shape
+    for x in prange(w):
+        for y in range(h):
+            out[x, y] = value(buffer[x, y], limit, bound)
+
+
+class OrbitStats:
+    """
+    The statistics of the orbits of a view, from which every kind is derived.
+
+    Usage:
+        orbits = OrbitStats()
+        compute(camera, Coloration.SMOOTH_TIME, limit=200, orbits=orbits)
+        curvature = orbits.values(Coloration.AVG_CURVATURE)
+        # only the pixels that did not escape are iterated further
+        deeper = compute(camera, Coloration.SMOOTH_TIME, limit=400, orbits=orbits)
+
+    The values are the same as the ones of compute() with Engine.TILES
+    and without periodicity checking.
+
+    :param kinds: the kinds that can be derived. Only their accumulators are
+        kept up to date, which makes the iterations cheaper. When they are
+        all in CONSTANT_INSIDE_KINDS, the main cardioid and bulb are not iterated.
+    """
+
+    def __init__(self, kinds=None):
+        self.kinds = set(Coloration) if kinds is None else set(kinds)
+        self.channels = tuple(kind in self.kinds for kind in CHANNEL_KINDS)
+        self.check_inside = self.kinds <= CONSTANT_INSIDE_KINDS
+
+        # Structured array of dtype ORBIT_STATS and of the size of the camera
+        self.buffer = None
+        self.view = None
+        self.limit = None
+        self.bound = None
+
+    @staticmethod
+    def _view(camera: SimpleCamera, julia):
+        """What defines the sample points of the pixels."""
+        return tuple(camera.size), camera.bottomleft, camera.step, julia
+
+    def holds(self, camera: SimpleCamera, limit=50, bound=DEFAULT_BOUND, julia=None):
+        """Whether the statistics of this view are recorded."""
+
+        return (
+            self.buffer is not None
+            and self.view == self._view(camera, julia)
+            and (self.limit, self.bound) == (limit, bound)
+        )
+
+    def can_resume(self, camera: SimpleCamera, limit=50, bound=DEFAULT_BOUND, julia=None):
+        """Whether the recorded orbits of this view can go on up to a higher limit."""
+
+        return (
+            self.buffer is not None
+            and self.view == self._view(camera, julia)
+            and self.bound == bound
+            and limit > self.limit
+            # the angle goes on after the escape, from a point that is not kept
+            and (bound >= 2 or Coloration.ANGLE not in self.kinds)
+        )
+
+    def _iterate(self, camera: SimpleCamera, start, limit, bound, julia):
+        w, h = self.buffer.shape
+        tiles = -(-w // DEFAULT_TILE_SIZE) * -(-h // DEFAULT_TILE_SIZE)
+        with dynamic_scheduling():
+            _iterate_view(
+                self.buffer,
+                camera.bottomleft,
+                camera.step,
+                start,
+                limit,
+                bound,
+                julia,
+                self.channels,
+                self.check_inside,
+                DEFAULT_TILE_SIZE,
+                tile_order(tiles),
+            )
+
+        self.view = self._view(camera, julia)
+        self.limit = limit
+        self.bound = bound
+
+    def record(self, camera: SimpleCamera, limit=50, bound=DEFAULT_BOUND, julia=None):
+        """Iterate the view of the camera and keep the statistics of its orbits."""
+
+        self.buffer = np.empty(tuple(camera.size), ORBIT_STATS)
+        self._iterate(camera, 0, limit, bound, julia)
+
+    def resume(self, camera: SimpleCamera, limit):
+        """
+        Go on with the recorded orbits up to a higher limit.
+
+        Only the pixels that did not escape before the previous limit are iterated.
+        """
+
+        view = self.view
+        assert self.can_resume(camera, limit, self.bound, view[-1]), "Those orbits cannot go on."
+        self._iterate(camera, self.limit, limit, self.bound, view[-1])
+
+    def values(self, kind: Coloration, out=None):
+        """
+        The values of the kind for the recorded view, as compute() gives them.
+
+        :param out: array of the size of the view to write the values in.
+        """
+
+        assert self.buffer is not None, "No orbits were recorded."
+        assert kind in self.kinds, f"The orbits were not recorded for {kind}."
+        if out is None:
+            out = np.empty(self.buffer.shape)
+
+        _values(out, self.buffer, STATS_VALUES[kind], self.limit, self.bound)
+        return out
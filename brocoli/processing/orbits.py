@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Coloration from an orbit.
+
+The engines that cannot iterate with complex floats, like perturbation or
+double-double, write the orbit of each pixel in a buffer instead. One of the
+ORBIT_REDUCTIONS then gives the value of the pixel. They return the same value
+as the escape function of the same kind.
+
+Each reduction gets the orbit from z0, of which only the points from `start`
+are written, its length n, the parameter c, limit and bound. The orbit must go
+on until it leaves the disc of radius max(bound, 2), or up to z_limit.
+"""
+
+from math import log
+
+from numba import njit
+
+from .compute import Coloration, ESCAPE_FUNCTIONS, lerp, push_last, smooth_coef, stable_identities
+
+
+@njit(cache=True)
+def _time(orbit, start, n, c, limit, bound):
+    for i in range(max(start, 1), min(n, limit)):
+        if abs(orbit[i]) > bound:
+            return i
+    return -limit
+
+
+@njit(cache=True)
+def _smooth_time(orbit, start, n, c, limit, bound):
+    for i in range(max(start, 1), min(n, limit)):
+        if abs(orbit[i]) > bound:
+            return i + log(log(bound) / log(abs(orbit[i]))) / log(2)
+    return -limit
+
+
+@njit(cache=True)
+def _angle(orbit, start, n, c, limit, bound):
+    s = orbit[0]
+    for i in range(1, min(n, limit)):
+        s += orbit[i]
+        if abs(orbit[i]) > 2:
+            return -abs(s) / (i + 1)
+    return -abs(s) / min(n, limit)
+
+
+@njit(cache=True)
+def _smoothfire(orbit, start, n, c, limit, bound):
+    ln12 = 1 / log(2)
+    lnbound = log(bound)
+
+    absc = abs(c)
+    absz = abs(orbit[0])
+    s = s1 = 0.0
+    i = 0
+    sign = -1
+    for i in range(1, limit):
+        s1 = s
+        absz = abs(orbit[i])
+        # z - c is the square of the previous point, without cancellation
+        zc = abs(orbit[i - 1]) ** 2
+        m = abs(zc - absc)
+        M = zc + absc
+
+        if i > 1 and M != m:
+            s += (absz - m) / (M - m)
+
+        if absz > bound:
+            sign = 1
+            break
+
+    d = 1 + ln12 * log(lnbound / abs(log(absz))) if absz != 1 else 0
+    S = s / (i - 1) if i > 1 else 0
+    S1 = s1 / (i - 2) if i > 2 else 0
+    return lerp(S1, S, d) * sign
+
+
+def addend_reduction(escape_func):
+    """Reduction for an escape function made with compute.addend."""
+
+    order = escape_func.order
+    t = escape_func.term
+    zeros = (0j,) * order
+
+    @njit
+    def reduction(orbit, start, n, c, limit, bound):
+        zs = push_last(zeros, orbit[0])
+        head = 0
+        s = s1 = 0.0
+        i = 0
+
+        sign = -1
+        for i in range(limit):
+            zs = push_last(zs, orbit[i + 1])
+
+            if i >= order - 1:
+                s1, s = s, s + t(zs, head)
+
+            if abs(zs[head - 1]) > bound:
+                sign = 1
+                break
+
+        S = s / (i - order + 2) if i > order - 2 else 0
+        S1 = s1 / (i - order + 1) if i > order - 1 else 0
+        d = smooth_coef(zs[head - 1], bound)
+        return lerp(S1, S, d) * sign
+
+    return reduction
+
+
+ORBIT_REDUCTIONS = {
+    Coloration.TIME: _time,
+    Coloration.SMOOTH_TIME: _smooth_time,
+    Coloration.ANGLE: _angle,
+    Coloration.AVG_TRIANGLE_INEQUALITY: _smoothfire,
+    Coloration.AVG_CURVATURE: addend_reduction(ESCAPE_FUNCTIONS[Coloration.AVG_CURVATURE]),
+    Coloration.AVG_STRIDE: addend_reduction(ESCAPE_FUNCTIONS[Coloration.AVG_STRIDE]),
+}
+
+stable_identities(ORBIT_REDUCTIONS, "reduction")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Deep zooms with perturbation theory.
+
+Below a height of about 1e-13, the pixels of a view cannot be told apart with
+floats. Instead, only one point, the reference, is iterated with all the digits
+it needs. Every pixel is then iterated as a small float offset to the reference
+orbit: if z = Z + d and c = C + dc, then d' = 2 Z d + d^2 + dc.
+
+When the orbit of a pixel gets closer to 0 than to the reference, the offset is
+not precise anymore (a glitch). The pixel is then rebased at the start of the
+reference orbit, which begins at 0 for the Mandelbrot set.
+
+Since the first iterations of the pixels are nearly the same, they are skipped
+with a series approximation of d in terms of dc: d = A dc + B dc^2 + C dc^3.
+
+Each kind of coloration is then computed from the orbit of the pixels.
+"""
+
+import logging
+from decimal import Decimal, localcontext
+
+import numpy as np
+from numba import njit, prange
+
+from .compute import Coloration
+from .orbits import ORBIT_REDUCTIONS
+
+logger = logging.getLogger("brocoli")
+
+# The second and third terms of the series must be this small compared to the first
+SERIES_TOLERANCE = 1e-9
+
+
+def reference_orbit(camera, limit, radius, julia=None):
+    """
+    Orbit of the center of the camera, computed with camera.precision digits.
+
+    For the Mandelbrot set the orbit starts at 0, so ref[k] is what compute.py
+    calls z_(k-1). For Julia sets it starts at the center.
+    The orbit stops after the first point outside the radius.
+
+    :return: the orbit as an array of complex.
+    """
+
+    real, imag = camera.decimal_center
+    orbit = []
+
+    with localcontext() as ctx:
+        ctx.prec = camera.precision
+
+        if julia is None:
+            cr, ci = real, imag
+            zr = zi = Decimal(0)
+            length = limit + 2
+        else:
+            cr, ci = Decimal(julia.real), Decimal(julia.imag)
+            zr, zi = real, imag
+            length = limit + 1
+
+        radius = Decimal(radius) ** 2
+        for _ in range(length):
+            orbit.append(complex(float(zr), float(zi)))
+            if zr * zr + zi * zi > radius:
+                break
+            zr, zi = zr * zr - zi * zi + cr, 2 * zr * zi + ci
+
+    return np.array(orbit, dtype=np.complex128)
+
+
+@njit(cache=True)
+def series_coefficients(ref, julia_mode, max_delta):
+    """
+    Coefficients of the series approximation of the offsets along the reference.
+
+    :param max_delta: largest offset of a pixel to the reference
+    :return: an array of the coefficients A, B, C for each iteration that can be
+        skipped by every pixel. Its last line is where the pixels start.
+    """
+
+    coefs = np.zeros((ref.size, 3), np.complex128)
+    if julia_mode:
+        coefs[0, 0] = 1
+
+    skip = 0
+    # The last points of the reference are kept for rebasing
+    for n in range(ref.size - 2):
+        a, b, c = coefs[n]
+        A = 2 * ref[n] * a + (0 if julia_mode else 1)
+        B = 2 * ref[n] * b + a * a
+        C = 2 * ref[n] * c + 2 * a * b
+
+        linear = SERIES_TOLERANCE * abs(A)
+        if not (abs(B) * max_delta <= linear and abs(C) * max_delta ** 2 <= linear):
+            break
+
+        coefs[n + 1] = A, B, C
+        skip = n + 1
+
+    return coefs[: skip + 1]
+
+
+@njit(cache=True)
+def _series(coefs, delta):
+    a, b, c = coefs
+    return ((c * delta + b) * delta + a) * delta
+
+
+@njit(cache=True)
+def _mandelbrot_orbit(orbit, ref, coefs, fill_prefix, dc, limit, radius):
+    """
+    Write the orbit of the pixel at offset dc from the reference in orbit.
+
+    The orbit is written from z0 = c, like the escape functions see it, and
+    stops after the first point outside the radius or at z_limit.
+    If fill_prefix is False, the iterations skipped with the series are not
+    written in orbit.
+
+    :return: the number of points of the orbit, and of rebases.
+    """
+
+    skip = coefs.shape[0] - 1
+    if fill_prefix:
+        for k in range(1, skip):
+            orbit[k - 1] = ref[k] + _series(coefs[k], dc)
+
+    m = k = skip
+    delta = _series(coefs[skip], dc)
+    rebases = 0
+    while True:
+        z = ref[m] + delta
+        if k >= 1:
+            orbit[k - 1] = z
+            if abs(z) > radius or k == limit + 1:
+                return k, rebases
+
+        if abs(z) < abs(delta) or m == ref.size - 1:
+            # The offset is now bigger than the point, so it is rebased
+            # on the start of the reference orbit, which is 0.
+            delta = z
+            m = 0
+            rebases += 1
+
+        delta = (2 * ref[m] + delta) * delta + dc
+        m += 1
+        k += 1
+
+
+@njit(cache=True)
+def _julia_orbit(orbit, ref, coefs, fill_prefix, dz, julia, limit, radius):
+    """
+    Same as _mandelbrot_orbit, for the Julia set of seed `julia`.
+
+    The Julia reference does not pass through 0, so glitched pixels are not
+    rebased. Once the offset is bigger than the point itself, the orbit is far
+    from the zoomed region and the pixel can be iterated with floats.
+    """
+
+    skip = coefs.shape[0] - 1
+    if fill_prefix:
+        for k in range(skip):
+            orbit[k] = ref[k] + _series(coefs[k], dz)
+
+    m = k = skip
+    delta = _series(coefs[skip], dz)
+    while True:
+        z = ref[m] + delta
+        orbit[k] = z
+        if abs(z) > radius or k == limit:
+            return k + 1, 0
+
+        if abs(z) < abs(delta) or m == ref.size - 1:
+            for k in range(k + 1, limit + 1):
+                z = z * z + julia
+                orbit[k] = z
+                if abs(z) > radius:
+                    break
+            return k + 1, 1
+
+        delta = (2 * ref[m] + delta) * delta
+        m += 1
+        k += 1
+
+
+# Those only look at the end of the orbit, so the skipped part is never written
+PREFIX_FREE_KINDS = {Coloration.TIME, Coloration.SMOOTH_TIME}
+
+
+@njit(parallel=True, cache=True)
+def _compute_perturbation(
+    out,
+    reduction,
+    ref,
+    coefs,
+    fill_prefix,
+    center,
+    pixstep,
+    limit,
+    bound,
+    radius,
+    julia,
+    tile_size,
+    order,
+    grid,
+    rebases,
+):
+    """
+    Same as _compute, with each pixel iterated as an offset to the reference.
+
+    The number of rebased pixels of each tile is written in `rebases`.
+    """
+
+    w, h = out.shape
+    gx, gy, gw, gh = grid
+    tiles_x = (w + tile_size - 1) // tile_size
+    start = 0 if fill_prefix else coefs.shape[0] - 1
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        # One orbit buffer per tile, not per pixel
+        orbit = np.empty(limit + 1, np.complex128)
+
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                delta = pixstep * complex(gx + x - gw / 2, gh / 2 - (gy + y) - 1)
+
+                if julia is None:
+                    n, r = _mandelbrot_orbit(orbit, ref, coefs, fill_prefix, delta, limit, radius)
+                    c = center + delta
+                    first = max(start - 1, 0)
+                else:
+                    n, r = _julia_orbit(orbit, ref, coefs, fill_prefix, delta, julia, limit, radius)
+                    c = julia
+                    first = start
+
+                out[x, y] = reduction(orbit, first, n, c, limit, bound)
+                rebases[tile] += r
+
+
+def compute_perturbation(out, camera, kind, limit, bound, julia, tile_size, order, grid, stats=None):
+    """
+    Compute the view of the camera in out, with perturbation theory.
+
+    This is used by compute() and supports every kind of Coloration but
+    DISTANCE, which compute() renders with floats instead.
+    """
+
+    # The orbit must go on until both the bound and the angle coloring stop
+    radius = max(bound, 2.0)
+    ref = reference_orbit(camera, limit, radius, julia)
+
+    max_delta = abs(camera.complex_size) / 2
+    coefs = series_coefficients(ref, julia is not None, max_delta)
+    skip = coefs.shape[0] - 1
+    logger.debug(f"Reference orbit of {ref.size} points, skipping {skip} iterations")
+
+    rebases = np.zeros(order.size, dtype=np.int64)
+    _compute_perturbation(
+        out,
+        ORBIT_REDUCTIONS[kind],
+        ref,
+        coefs,
+        kind not in PREFIX_FREE_KINDS,
+        camera.center,
+        camera.step,
+        limit,
+        bound,
+        radius,
+        julia,
+        tile_size,
+        order,
+        grid,
+        rebases,
+    )
+
+    if stats is not None:
+        stats.tile_size = tile_size
+        stats.series_skip = skip
+        stats.rebases = int(rebases.sum())
+        logger.debug("Rebased %s pixels", stats.rebases)
+
+    return out
@@ -1,7 +1,59 @@
+from collections import OrderedDict
+
 import numpy as np
+from numba import get_num_threads, njit, prange
+
+# do_bins() estimates the boundaries of the bins on this many pixels
+BINS_SAMPLE = 1_000_000
+# preprocess() discretizes the values in this many quantiles
+QUANTILES = 1000
+# preprocess_chunked() holds about this many values in memory at once
+CHUNK_SIZE = 1 << 22
+# preprocess_stats() keeps the statistics of this many fields
+STATS_CACHE_SIZE = 3
+
+
+def _sample(values, sample):
+    """The values, or this many of them drawn at random when there are more."""
+
+    if sample is not None and values.size > sample:
+        # the same pixels for the same array, so that renders are reproducible
+        return values[_sample_indices(values.size, sample)]
+    return values
 
 
-def normalize_quantiles(surf, nb, exclude_inside=True):
+def _sample_indices(size, sample):
+    return np.random.default_rng(0).integers(size, size=sample)
+
+
+def _quantile_steps(values, nb, exclude_inside=True):
+    """
+    The nb quantiles of the values, see normalize_quantiles().
+
+    :return: (steps, zero) where zero is the number of steps that are inside
+    """
+
+    # Only the quantiles need to be in place, which is cheaper than sorting
+    indices = _quantile_indices(values.size, nb)
+    steps = np.partition(values, indices)[indices]
+    zero = steps.searchsorted(0, "right") if exclude_inside else 0
+    return steps, zero
+
+
+def _quantile_indices(size, nb):
+    """Indices of the quantiles in the sorted values."""
+    return (np.linspace(0, 1, nb, endpoint=False) * size).astype(int)
+
+
+def _apply_quantiles(surf, steps, zero):
+    # Each value gets the index of the last step below it
+    new = steps.searchsorted(surf, "right") - (1 + zero)
+    new = new.astype(float)
+    new[np.isnan(surf)] = np.nan
+    return new
+
+
+def normalize_quantiles(surf, nb, exclude_inside=True, sample=None):
     """
     Discretize the array such that every number has approximately the same area.
 
@@ -10,92 +62,175 @@ def normalize_quantiles(surf, nb, exclude_inside=True):
     :param surf: ndarray to process
     :param nb: nb of discrete values in the return
     :param exclude_inside: keep the negative values negative
+    :param sample: estimate the quantiles from this many pixels drawn at
+        random, instead of all of them, for very large arrays.
     :return: ndarray with the same shape and discrete values.
     """
 
-    values = np.sort(surf.flatten())
-    indices = (np.linspace(0, 1, nb, endpoint=False) * values.size).astype(int)
-    steps = values[indices]
-    zero = steps.searchsorted(0, "right") if exclude_inside else 0
+    steps, zero = _quantile_steps(_sample(surf.ravel(), sample), nb, exclude_inside)
+    return _apply_quantiles(surf, steps, zero)
+
+
+@njit(parallel=True, cache=True)
+def _bins_ip(flat, boundaries, zero):
+    """Map each positive value of flat to its bin, in place. See do_bins()."""
 
-    new = np.empty(surf.shape)
-    for part, bound in enumerate(steps):
-        new[surf >= bound] = part - zero
+    nb = boundaries.size - 1
+    for i in prange(flat.size):
+        value = flat[i]
+        # the inside and NaN are kept
+        if not value >= 0:
+            continue
 
-    return new.reshape(surf.shape)
+        # the last bin that starts below the value, like the loop over the
+        # bins did, and the first or last bin outside of the boundaries
+        part = min(max(np.searchsorted(boundaries, value, side="right") - 1, 0), nb - 1)
+        start = boundaries[part]
+        width = boundaries[part + 1] - start
+        t = (value - start) / width if width > 0 else 0.0
+        flat[i] = part - zero + min(max(t, 0.0), 1.0)
 
 
-def do_bins(surf, nb):
+def do_bins(surf, nb, sample=BINS_SAMPLE):
     """
     Modify the array such that [nb] parts have the same size and the same range.
 
     Preserves the order (ie surf[x] < surf[y] => f(surf)[x] < f(surf)[y]).
+    The array is modified in place and returned.
     Example:
         bins(surf, 2) maps half of the surface to [0, 1] and the other half to [1, 2].
+
+    :param sample: past this many pixels, the boundaries of the bins are
+        estimated on as many pixels drawn at random. The values outside of
+        them go to the ends of the first and last bins.
     """
 
     assert nb >= 1
 
-    inside = (surf < 0)
+    bins = _bins_boundaries(_sample(surf.ravel(), sample), nb)
+    if bins is None:
+        return surf  # less values than bins
+
+    surf = np.ascontiguousarray(surf)
+    _bins_ip(surf.reshape(-1), *bins)
+    return surf
+
 
-    values = np.sort(surf[~inside].flatten())
+def _bins_boundaries(values, nb):
+    """
+    The boundaries of the nb bins of the positive values, see do_bins().
+
+    :return: (boundaries, zero) for _bins_ip(), or None when there are less values than bins
+    """
 
+    values = values[values >= 0]
     if values.size < nb + 1:
-        return surf  # less values than bins
+        return None
 
-    indices = (np.linspace(0, 1, nb+1, endpoint=True) * values.size).astype(int)
-    indices[-1] -= 1  # We want the last value in the array
-    boundaries = values[indices]
+    # Only the boundaries need to be in place, which is cheaper than sorting
+    indices = _bins_indices(values.size, nb)
+    boundaries = np.partition(values, indices)[indices]
     zero = boundaries.searchsorted(0, "right")
-    print(zero)
+    return boundaries, zero
+
 
-    new = surf.copy()
-    last = boundaries[0]
-    for part, bound in enumerate(boundaries[1:]):
-        mask = (last <= surf) & (surf <= bound)
-        new[mask] = part - zero + (surf[mask] - last) / (bound - last)
-        last = bound
+def _bins_indices(size, nb):
+    """Indices of the boundaries of the bins in the sorted positive values."""
 
-    return new.reshape(surf.shape)
+    indices = (np.linspace(0, 1, nb+1, endpoint=True) * size).astype(int)
+    indices[-1] -= 1  # We want the last value in the array
+    return indices
 
 
-def signed_normalize_ip(fractal, speed=1.0, offset=0.0):
+@njit(cache=True, error_model="numpy")
+def _signed_pow(value, power):
+    """
+    abs(value) ** power * sign(value)
+
+    Like with numpy, 0 to a negative power gives NaN instead of raising, the
+    power is a float so that numba does not use its integer power that raises.
+    """
+
+    return abs(value) ** float(power) * np.sign(value)
+
+
+@njit(parallel=True, cache=True, error_model="numpy")
+def _signed_extrema_ip(flat, power, chunks):
+    """
+    Raise the values to the power in place, keeping their sign, unless the power is 1.
+
+    :return: the min and max of the positive values, then of the negative
+        ones. NaN are ignored.
+    """
+
+    extrema = np.empty((chunks, 4))
+    for k in prange(chunks):
+        pos_min = neg_min = np.inf
+        pos_max = neg_max = -np.inf
+        for i in range(k * flat.size // chunks, (k + 1) * flat.size // chunks):
+            value = flat[i]
+            if power != 1:
+                value = _signed_pow(value, power)
+                flat[i] = value
+
+            if value >= 0:
+                pos_min = min(pos_min, value)
+                pos_max = max(pos_max, value)
+            elif value < 0:
+                neg_min = min(neg_min, value)
+                neg_max = max(neg_max, value)
+
+        extrema[k] = pos_min, pos_max, neg_min, neg_max
+
+    return extrema[:, 0].min(), extrema[:, 1].max(), extrema[:, 2].min(), extrema[:, 3].max()
+
+
+@njit(parallel=True, cache=True, error_model="numpy")
+def _signed_normalize_ip(flat, pos_min, pos_max, neg_min, neg_max, speed, offset, power):
+    """Normalize in place, after raising to the power. The extrema are the ones after the power."""
+
+    for i in prange(flat.size):
+        value = flat[i]
+        if power != 1:
+            value = _signed_pow(value, power)
+            flat[i] = value  # when it is NaN
+        # The values beyond the extrema, which were found on other values, go
+        # to the ends. Without values of a sign, its min is above its max.
+        if value >= 0:
+            if pos_min < pos_max:
+                value = (min(max(value, pos_min), pos_max) - pos_min) / (pos_max - pos_min)
+                flat[i] = (value * speed + offset) % 1.0
+            else:
+                flat[i] = 1
+        elif value < 0:
+            if neg_min < neg_max:
+                value = (min(max(value, neg_min), neg_max) - neg_max) / (neg_max - neg_min)
+                flat[i] = (value * speed + offset) % 1.0 - 1
+            else:
+                flat[i] = -1
+
+
+def signed_normalize_ip(fractal, speed=1.0, offset=0.0, power=1):
     """
     Normalize a fractal and keep the the sign of each value.
 
     Negative numbers are mapped to [-1, 0] and positive to [0, 1]
     The speed and offset rotate the normalized values.
+    It takes two passes over the array, and no other memory.
 
     :param speed: rotation stretch
     :param offset: rotation
-    :return: a ndarray with valuesbetween -1 and 1
+    :param power: the values are first raised to this power, like signed_power()
+    :return: a ndarray with valuesbetween -1 and 1. It is the fractal
+        itself unless it is not contiguous.
     """
 
-    pos = fractal[fractal >= 0]
-    neg = fractal[fractal < 0]
-
-    if pos.size > 0:
-        mini = np.nanmin(pos)
-        maxi = np.nanmax(pos)
-        if mini != maxi:
-            pos[:] = (pos - mini) / (maxi - mini)
-            pos[:] = (pos * speed + offset) % 1.0
-        else:
-            pos[:] = 1
-
-    if neg.size > 0:
-        mini = np.nanmin(neg)
-        maxi = np.nanmax(neg)
-        if mini != maxi:
-            neg[:] = (neg - maxi) / (maxi - mini)
-            neg[:] = (neg * speed + offset) % 1.0 - 1
-        else:
-            neg[:] = -1
-
-        assert (neg <= 0).all()
+    fractal = np.ascontiguousarray(fractal)
+    flat = fractal.reshape(-1)
 
-    fractal[fractal >= 0] = pos
-    fractal[fractal < 0] = neg
+    # The extrema are reduced by chunks, several per thread to balance them
+    extrema = _signed_extrema_ip(flat, power, 4 * get_num_threads())
+    _signed_normalize_ip(flat, *extrema, speed, offset, 1)
 
     return fractal
 
@@ -106,10 +241,13 @@ def signed_power(fractal, power):
 
     :return: abs(fractal) ** power * sign(fractal)
     """
-    return abs(fractal) ** power * np.sign(fractal)
+
+    fractal = np.array(fractal, dtype=float)
+    _signed_extrema_ip(fractal.reshape(-1), power, 1)
+    return fractal
 
 
-def preprocess(fractal, bins=1, norm_quantiles=False, steps_power=1):
+def preprocess(fractal, bins=1, norm_quantiles=False, steps_power=1, quantile_sample=None):
     """
     Normalise the values of the fractal before coloration.
 
@@ -121,6 +259,8 @@ def preprocess(fractal, bins=1, norm_quantiles=False, steps_power=1):
     :param norm_quantiles: whether to apply normalize_quantiles()
     :param steps_power: raise the fractal to a given power, to emphasis
         on low or high escape times
+    :param quantile_sample: estimate the quantiles on this many pixels, see
+        normalize_quantiles()
     :return:
     """
 
@@ -128,12 +268,282 @@ def preprocess(fractal, bins=1, norm_quantiles=False, steps_power=1):
         fractal = do_bins(fractal, bins)
 
     if norm_quantiles:
-        fractal = normalize_quantiles(fractal, 1000)
+        fractal = normalize_quantiles(fractal, QUANTILES, sample=quantile_sample)
+
+    # The power is applied in the same passes as the normalization
+    power = steps_power if steps_power not in (0, 1) else 1
+    return signed_normalize_ip(fractal, power=power)
+
+
+def _chunks(array, chunk_size):
+    """Slices of the first axis of the array, of about chunk_size values each."""
+
+    rows = array.shape[0]
+    step = max(1, chunk_size // _row_size(array))
+    return [slice(start, min(start + step, rows)) for start in range(0, rows, step)]
+
+
+def _row_size(array):
+    return int(np.prod(array.shape[1:]))
+
+
+def preprocess_chunked(
+    fractal, out, bins=1, norm_quantiles=False, steps_power=1, chunk_size=CHUNK_SIZE, sample=BINS_SAMPLE
+):
+    """
+    Same as preprocess(), for fractals that do not fit in memory, like memmaps.
+
+    The fractal is read by chunks of about chunk_size values:
+     - the first pass draws a sample of `sample` values, on which the
+       boundaries of the bins and then the quantiles are found,
+     - the second applies the bins, quantiles and power to each chunk, writes
+       it in out and finds the extrema,
+     - the last normalizes out in place.
+    Only a chunk and the sample are in memory at once. When the fractal has
+    no more values than the sample, the result is the one of preprocess().
+    Otherwise the bins and quantiles are estimated like with its
+    quantile_sample: with a sample of a quarter of the field, the values
+    differ by 0.3% on average, and a few of the smallest positive values
+    can become negative when a quantile is next to 0.
+
+    :param fractal: ndarray or memmap to process, it is not modified
+    :param out: ndarray or memmap of the shape of the fractal, where the
+        result is written. It can be the fractal itself.
+    :param chunk_size: values processed at once, the chunks are made of whole rows
+    :return: out
+    """
+
+    assert fractal.shape == out.shape
+    chunks = _chunks(fractal, chunk_size)
+    row_size = _row_size(fractal)
+
+    # The indices of the sample in the flat fractal, sorted to be read in order
+    if fractal.size > sample:
+        indices = np.sort(_sample_indices(fractal.size, sample))
+    else:
+        indices = np.arange(fractal.size)
+    values = np.empty(indices.size)
+    for rows in chunks:
+        start, stop = rows.start * row_size, rows.stop * row_size
+        first, last = indices.searchsorted((start, stop))
+        flat = np.asarray(fractal[rows], dtype=float).reshape(-1)
+        values[first:last] = flat[indices[first:last] - start]
+    del indices
+
+    # The statistics of each step are the ones of the sample after the steps before it
+    boundaries = _bins_boundaries(values, bins) if bins > 1 else None
+    if boundaries is not None:
+        _bins_ip(values, *boundaries)
+    steps = _quantile_steps(values, QUANTILES) if norm_quantiles else None
+    del values
+
+    power = steps_power if steps_power not in (0, 1) else 1
+    extrema = []
+    for rows in chunks:
+        chunk = np.array(fractal[rows], dtype=float)
+        flat = chunk.reshape(-1)
+        if boundaries is not None:
+            _bins_ip(flat, *boundaries)
+        if steps is not None:
+            chunk = _apply_quantiles(chunk, *steps)
+            flat = chunk.reshape(-1)
+        extrema.append(_signed_extrema_ip(flat, power, 4 * get_num_threads()))
+        out[rows] = chunk
+
+    extrema = np.array(extrema).reshape(-1, 4)
+    pos_min, neg_min = extrema[:, 0].min(initial=np.inf), extrema[:, 2].min(initial=np.inf)
+    pos_max, neg_max = extrema[:, 1].max(initial=-np.inf), extrema[:, 3].max(initial=-np.inf)
+    for rows in chunks:
+        chunk = np.array(out[rows], dtype=float)
+        _signed_normalize_ip(chunk.reshape(-1), pos_min, pos_max, neg_min, neg_max, 1.0, 0.0, 1)
+        out[rows] = chunk
+
+    return out
+
+
+class PreprocessStats:
+    """
+    The statistics of a raw field that preprocess() finds, for any of its parameters.
+
+    Without bins nor quantiles, the extrema of the field are found in one pass
+    and raised to the power. Otherwise the values are sorted once, the first
+    time they are needed. The boundaries of the bins and the quantiles are
+    then read in the sorted values, and the extrema of the result are found by
+    bisecting them: the bins, quantiles and a positive power keep the order of
+    the negative values and the one of the positive values. The bins of large
+    fields are found on a sample, and their extrema on the remapped field,
+    unless the values are already sorted. A change of the parameters only
+    costs the remap of the field, which gives the same result as preprocess().
+
+    The field must not be modified while its statistics are in use.
+    """
+
+    def __init__(self, fractal):
+        self.fractal = fractal
+        self._sorted = None
+        self._raw_extrema = None
+        self._positives = None
+        self._boundaries = {}
+        self._steps = {}
+        self._extrema = {}
+
+    @property
+    def sorted(self):
+        """
+        The values of the field, sorted with the NaN last, like np.partition does.
+
+        The first access sorts them and sets the number of negative values
+        and of values that are not NaN, in negatives and numbers.
+        """
+
+        if self._sorted is None:
+            self._sorted = np.sort(self.fractal, axis=None)
+            self.negatives = self._sorted.searchsorted(0)
+            self.numbers = self._sorted.size - np.count_nonzero(np.isnan(self._sorted))
+        return self._sorted
+
+    def boundaries(self, nb):
+        """The bins of do_bins() as given to _bins_ip(), or None when it keeps the field as is."""
+
+        if nb not in self._boundaries:
+            if self._positives is None:
+                # do_bins() finds them on a sample of the large fields
+                if self.fractal.size > BINS_SAMPLE:
+                    sample = _sample(self.fractal.ravel(), BINS_SAMPLE)
+                    self._positives = np.sort(sample[sample >= 0])
+                else:
+                    self._positives = self.sorted[self.negatives : self.numbers]
+
+            positives = self._positives
+            if positives.size < nb + 1:
+                self._boundaries[nb] = None
+            else:
+                boundaries = positives[_bins_indices(positives.size, nb)]
+                self._boundaries[nb] = boundaries, boundaries.searchsorted(0, "right")
+
+        return self._boundaries[nb]
+
+    def steps(self, bins):
+        """The quantiles of normalize_quantiles() after do_bins(), as (steps, zero)."""
+
+        if bins not in self._steps:
+            values = self.sorted
+            boundaries = self.boundaries(bins) if bins > 1 else None
+            if boundaries is not None:
+                # The binned positive values stay sorted, and merging them
+                # with the negative ones is a single pass of the stable sort
+                values = values.copy()
+                _bins_ip(values, *boundaries)
+                values = np.sort(values, kind="stable")
+
+            steps = values[_quantile_indices(values.size, QUANTILES)]
+            self._steps[bins] = steps, steps.searchsorted(0, "right")
+
+        return self._steps[bins]
+
+    def remap(self, values, bins=1, norm_quantiles=False, power=1):
+        """The values after the bins, quantiles and power of preprocess(), in a new array."""
+
+        values = np.array(values, dtype=float)
+        boundaries = self.boundaries(bins) if bins > 1 else None
+        if boundaries is not None:
+            _bins_ip(values.reshape(-1), *boundaries)
+        if norm_quantiles:
+            values = _apply_quantiles(values, *self.steps(bins))
+        if power != 1:
+            _signed_extrema_ip(values.reshape(-1), power, 1)
+        return values
+
+    def extrema(self, bins=1, norm_quantiles=False, power=1):
+        """The extrema that signed_normalize_ip() finds on the remapped field. The power must be positive."""
+
+        if bins <= 1 and not norm_quantiles:
+            if self._raw_extrema is None:
+                # The power 1 does not modify the field
+                flat = np.ascontiguousarray(self.fractal, dtype=float).reshape(-1)
+                self._raw_extrema = _signed_extrema_ip(flat, 1, 4 * get_num_threads())
+            # A positive power keeps the order and the sign of the values
+            return tuple(self.remap(self._raw_extrema, power=power))
+
+        pos_min = neg_min = np.inf
+        pos_max = neg_max = -np.inf
+        for values in (self.sorted[: self.negatives], self.sorted[self.negatives : self.numbers]):
+            if values.size == 0:
+                continue
+
+            # The first value that is mapped to a positive one
+            low, high = 0, values.size
+            while low < high:
+                middle = (low + high) // 2
+                if self.remap(values[middle : middle + 1], bins, norm_quantiles, power)[0] >= 0:
+                    high = middle
+                else:
+                    low = middle + 1
+
+            ends = values[[0, max(low - 1, 0), min(low, values.size - 1), -1]]
+            first, last_negative, first_positive, last = self.remap(ends, bins, norm_quantiles, power)
+            if low > 0:
+                neg_min = min(neg_min, first)
+                neg_max = max(neg_max, last_negative)
+            if low < values.size:
+                pos_min = min(pos_min, first_positive)
+                pos_max = max(pos_max, last)
+
+        return pos_min, pos_max, neg_min, neg_max
+
+    def preprocess(self, bins=1, norm_quantiles=False, steps_power=1, values=None):
+        """
+        Same as preprocess() on the field, which is not modified.
+
+        :param values: other values to map with the statistics of the field,
+            like samples of the same view, instead of the field. The ones
+            beyond its extrema go to the ends of the range of the field.
+        """
+
+        power = steps_power if steps_power not in (0, 1) else 1
+        key = bins, norm_quantiles, power
+        field = None
+        if key not in self._extrema:
+            if power > 0 and (bins <= 1 or norm_quantiles or self._sorted is not None):
+                self._extrema[key] = self.extrema(bins, norm_quantiles, power)
+            else:
+                # The order is reversed by a negative power, and the bins of
+                # large fields are found without sorting it, so the extrema
+                # are found on the field, in the pass that raises it to the power
+                field = self.remap(self.fractal, bins, norm_quantiles)
+                self._extrema[key] = _signed_extrema_ip(field.reshape(-1), power, 4 * get_num_threads())
+        extrema = self._extrema[key]
+
+        if values is None and field is not None:
+            _signed_normalize_ip(field.reshape(-1), *extrema, 1.0, 0.0, 1)
+            return field
+
+        values = self.remap(self.fractal if values is None else values, bins, norm_quantiles)
+        _signed_normalize_ip(values.reshape(-1), *extrema, 1.0, 0.0, power)
+        return values
+
+
+_stats_cache = OrderedDict()
+
+
+def preprocess_stats(fractal):
+    """
+    The PreprocessStats of the field, which are kept for the last STATS_CACHE_SIZE fields.
+
+    The fields are told apart by their identity, so a field modified in place
+    must not be given again.
+    """
+
+    # The cache holds the field, so its id is not given to another one meanwhile
+    stats = _stats_cache.pop(id(fractal), None)
+    if stats is None:
+        stats = PreprocessStats(fractal)
+    _stats_cache[id(fractal)] = stats
 
-    if steps_power not in (0, 1):
-        fractal = signed_power(fractal, steps_power)
+    while len(_stats_cache) > STATS_CACHE_SIZE:
+        _stats_cache.popitem(last=False)
 
-    return signed_normalize_ip(fractal)
+    return stats
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Progressive rendering, from a coarse preview to the full resolution.
+
+The first pass computes one pixel every `coarsest` pixels in each direction,
+and each next pass halves this stride. A pass only computes the pixels that are
+on its grid but not on the grid of the previous pass, so the total work is the
+same as a single render. After each pass, the pixels that are not computed yet
+take the value of the closest computed pixel on their top left.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+from .camera import SimpleCamera
+from .compute import (
+    DEFAULT_BOUND,
+    DEFAULT_TILE_SIZE,
+    CONSTANT_INSIDE_KINDS,
+    Coloration,
+    dynamic_scheduling,
+    escape_at,
+    escape_function,
+    tile_order,
+)
+
+__all__ = ["compute_progressive"]
+
+
+@njit(parallel=True, cache=True)
+def _compute_pass(
+    out, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, stride, first, tile_size, order
+):
+    """
+    Compute the pixels whose coordinates are multiples of stride.
+
+    Unless this is the first pass, the pixels whose coordinates are multiples of
+    2 * stride are already computed and skipped. tile_size must be a multiple
+    of stride.
+    """
+
+    w, h = out.shape
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+
+        for x in range(x0, min(x0 + tile_size, w), stride):
+            for y in range(y0, min(y0 + tile_size, h), stride):
+                if not first and x % (2 * stride) == 0 and y % (2 * stride) == 0:
+                    continue
+
+                z0 = bottomleft + pixstep * complex(x, h - y - 1)
+                out[x, y] = escape_at(escape_func, z0, limit, bound, julia, check_inside)[0]
+
+
+def compute_progressive(
+    camera: SimpleCamera,
+    kind: Coloration,
+    out=None,
+    limit=50,
+    bound=DEFAULT_BOUND,
+    julia=None,
+    coarsest=8,
+    check_inside=True,
+    periodicity=False,
+):
+    """
+    Compute the view of the camera in passes of increasing resolution.
+
+    The parameters are the same as compute(). This is a generator that yields
+    the out array after each pass, with the missing pixels filled by the closest
+    computed ones. The same array is updated in place by the next pass, so it
+    must be copied to be kept. The last array is the same as compute() gives.
+
+    :param coarsest: one pixel out of coarsest in each direction is computed
+        in the first pass. Must be a power of two.
+    """
+
+    assert coarsest >= 1 and coarsest & (coarsest - 1) == 0, "coarsest must be a power of two."
+
+    if out is None:
+        out = np.empty(camera.size)
+    else:
+        assert (
+            tuple(camera.size) == out.shape
+        ), f"The camera and out array have different sizes. {camera.size} != {out.shape}"
+
+    escape_func = escape_function(kind, periodicity, julia=julia is not None)
+    check_inside = check_inside and kind in CONSTANT_INSIDE_KINDS
+
+    # Tiles must contain whole cells of the coarsest grid
+    tile_size = -(-DEFAULT_TILE_SIZE // coarsest) * coarsest
+    w, h = out.shape
+    order = tile_order(-(-w // tile_size) * -(-h // tile_size))
+
+    stride = coarsest
+    while stride >= 1:
+        with dynamic_scheduling():
+            _compute_pass(
+                out,
+                escape_func,
+                camera.bottomleft,
+                camera.step,
+                limit,
+                bound,
+                julia,
+                check_inside,
+                stride,
+                stride == coarsest,
+                tile_size,
+                order,
+            )
+
+        if stride > 1:
+            xs = np.arange(w) // stride * stride
+            ys = np.arange(h) // stride * stride
+            out[:] = out[np.ix_(xs, ys)]
+
+        yield out
+        stride //= 2
@@ -29,6 +29,23 @@ def random_kind():
     )
 
 
+def border_mask(values):
+    """
+    The pixels inside the set with a neighbour outside of it, in a view of escape times.
+
+    The pixels on the edges of the view are never on the border.
+    """
+
+    outside = values > 0
+    near = np.zeros_like(outside)
+    w, h = values.shape
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            near[1:-1, 1:-1] |= outside[1 + dx : w - 1 + dx, 1 + dy : h - 1 + dy]
+
+    return (values < 0) & near
+
+
 def random_position():
 
     # Size of the small image that we draw
@@ -38,6 +55,10 @@ def random_position():
 
     # The starting viewpoint contains the full mandelbrot set
     camera = SimpleCamera(size, -0.75, 3)
+    # Centers and heights of the views we zoomed from
+    previous = []
+    # Whether the last iteration zoomed, to a view that was not drawn
+    zoomed = False
 
     # Number of times to zoom on a random point of the border
     iterations = random.randint(3, 15)
@@ -45,23 +66,24 @@ def random_position():
         # Draw a small image of the set
         compute(camera, Coloration.TIME, out=surf, limit=limits)
 
-        # now we find a pixel on the border and zoom there
-        found = False
-        while not found:
-            # Pick a random index
-            x, y = random.randrange(1, size[0] - 1), random.randrange(1, size[1] - 1)
-
-            if surf[x, y] < 0:
-                # we are inside, but are we on the border ?
-                for dx in (-1, 0, 1):
-                    for dy in (-1, 0, 1):
-                        # one of the neighbors is not in the set
-                        if surf[x + dx, y + dy] > 0:
-                            found = True
+        # now we pick a pixel on the border and zoom there
+        border = np.flatnonzero(border_mask(surf))
+        if border.size == 0:
+            # No border is visible anymore, go back to the last view
+            if previous:
+                camera.center, camera.height = previous.pop()
+            zoomed = False
+            continue
+
+        x, y = np.unravel_index(border[random.randrange(border.size)], size)
+        previous.append((camera.center, camera.height))
         # Zoom x3 with on the pixel found
         camera.center = camera.complex_at((x, y))
         camera.height /= 3
-    camera.height *= 3
+        zoomed = True
+
+    if zoomed:
+        camera.height *= 3
 
     return camera
 
@@ -146,24 +168,35 @@ def random_gradient():
     return ga.best_RGB()
 
 
+# optimal_limit() picks a power of two between those
+MIN_LIMIT_POWER = 7
+MAX_LIMIT_POWER = 13
+# A limit is enough when fewer new pixels escape below it
+NEW_ESCAPES = 30
+
+
 def optimal_limit(camera):
-    camera = SimpleCamera((50, 50), camera.center, camera.height)
+    """
+    The first power of two limit below which fewer than NEW_ESCAPES more pixels escape.
 
-    # we use a dichotomy on n to find which 2**n
-    # there is less than 50 pixels that changes in a 50x50 image
-    n = 6
-    last = 0
-    while n < 13:
-        n += 1
-        new = compute(camera, Coloration.TIME, limit=2 ** n)
+    A 50x50 view is computed once with the highest limit: the iteration where
+    a pixel escapes does not depend on the limit, so the histogram of the
+    escape times over the powers of two tells how many pixels each limit
+    would see escaping.
+    """
 
-        escaped = (new > 0).sum()
-        if escaped - last < 30 and escaped > 0:
-            break
+    camera = SimpleCamera((50, 50), camera.center, camera.height)
+    times = compute(camera, Coloration.TIME, limit=2 ** MAX_LIMIT_POWER)
 
-        last = escaped
+    # new[k] pixels escape in [2 ** (p - 1), 2 ** p) for p = powers[k], and in [1, 2 ** p) for the first
+    powers = np.arange(MIN_LIMIT_POWER, MAX_LIMIT_POWER + 1)
+    new, _ = np.histogram(times, bins=np.concatenate(([1], 2 ** powers)))
+    escaped = np.cumsum(new)
 
-    return 2 ** n
+    enough = (new < NEW_ESCAPES) & (escaped > 0)
+    if enough.any():
+        return 2 ** int(powers[enough.argmax()])
+    return 2 ** MAX_LIMIT_POWER
 
 
 def random_fractal(size=(1920, 1080), seed=None):
@@ -185,7 +218,7 @@ def random_fractal(size=(1920, 1080), seed=None):
     logger.info("Limit: %s", limit)
 
     kind = random_kind()
-    not_average = kind in (Coloration.SMOOTH_TIME, Coloration.TIME)
+    not_average = kind in (Coloration.SMOOTH_TIME, Coloration.TIME, Coloration.DISTANCE)
     speed = 1 + not_average
     camera.size = size
     bound = 2 ** random.randint(1, 20)
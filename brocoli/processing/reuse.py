@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Reuse the previous view to compute the next one.
+
+When the camera moves by a whole number of pixels at the same height, the
+pixels of the new view that were in the old one are the same points of the
+plane. They are copied from the previous view and only the strips that were
+not visible are iterated, so a pan costs as much as the area it uncovers.
+
+The same holds when the height is halved or doubled and the pixel grids line
+up, like after SimpleCamera.zoom(0.5, pixel) or zoom(2, pixel): a quarter of
+the pixels of the zoomed in view are points of the previous one, and the
+previous view is a quarter of the zoomed out one.
+
+The copied points agree with the ones compute() would sample up to the float
+rounding of their position, which is about 1e-13 of a pixel. The kinds in
+CONSTANT_INSIDE_KINDS are constant inside the set, and this changes their
+values outside by a relative 1e-9 at most, so they are copied that way by
+default, which is what the GUI does. The
+values of the other kinds average the orbits that stay inside the set,
+which are chaotic and amplify the rounding to any size. Like with
+exact=True for every kind, only the pixels whose sample is the very same
+float are copied for them, and the views are bit-identical to the ones of
+compute(). Far fewer pixels line up that well: a few percent of the view
+instead of a quarter on a 2x zoom, and only part of the overlap of a pan,
+depending on how the sample points round.
+"""
+
+import logging
+
+import numpy as np
+from numba import njit, prange
+
+from .camera import SimpleCamera
+from .compute import (
+    DEFAULT_BOUND,
+    DEFAULT_TILE_SIZE,
+    CONSTANT_INSIDE_KINDS,
+    Coloration,
+    Engine,
+    choose_engine,
+    compute,
+    dynamic_scheduling,
+    escape_at,
+    escape_function,
+    tile_order,
+)
+
+__all__ = ["ViewCache"]
+
+logger = logging.getLogger("brocoli")
+
+# How far from a whole number of pixels a move can be and still line up with the grid
+PIXEL_TOLERANCE = 1e-6
+# Ratios of the new step to the previous one, with the scales of the
+# previous and new grids on the finest of the two.
+ZOOM_SCALES = {1.0: (1, 1), 0.5: (2, 1), 2.0: (1, 2)}
+
+
+@njit(parallel=True, cache=True)
+def _compute_reusing(
+    out,
+    previous,
+    scale_previous,
+    scale,
+    kx,
+    ky,
+    exact,
+    previous_bottomleft,
+    previous_pixstep,
+    escape_func,
+    bottomleft,
+    pixstep,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    reused,
+):
+    """
+    Same as _compute, but the pixels that are in the previous view are copied.
+
+    Both grids are seen on the finest one, starting from the bottom left pixel
+    of the previous view. The pixel (x, y) of out is at (kx + scale * x, ky + scale * (h - y - 1))
+    and the pixel (x, y) of previous at scale_previous * (x, ph - y - 1).
+    If exact is True, only the pixels with the same sample point are copied.
+    The number of copied pixels of each tile is written in `reused`.
+    """
+
+    w, h = out.shape
+    pw, ph = previous.shape
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+
+        for x in range(x0, min(x0 + tile_size, w)):
+            for y in range(y0, min(y0 + tile_size, h)):
+                z0 = bottomleft + pixstep * complex(x, h - y - 1)
+
+                fx = kx + scale * x
+                fy = ky + scale * (h - y - 1)
+                px = fx // scale_previous
+                py = ph - 1 - fy // scale_previous
+                if (
+                    fx % scale_previous == 0
+                    and fy % scale_previous == 0
+                    and 0 <= px < pw
+                    and 0 <= py < ph
+                    and (
+                        not exact
+                        or previous_bottomleft + previous_pixstep * complex(px, ph - py - 1) == z0
+                    )
+                ):
+                    out[x, y] = previous[px, py]
+                    reused[tile] += 1
+                else:
+                    out[x, y] = escape_at(escape_func, z0, limit, bound, julia, check_inside)[0]
+
+
+def _parameters(
+    kind: Coloration, limit=50, bound=DEFAULT_BOUND, julia=None, check_inside=True, periodicity=False
+):
+    """All the parameters of compute() that change the values of the pixels, with their defaults."""
+
+    return dict(
+        kind=kind,
+        limit=limit,
+        bound=bound,
+        julia=julia,
+        check_inside=check_inside,
+        periodicity=periodicity,
+    )
+
+
+class ViewCache:
+    """
+    Compute views like compute() does, reusing the last one when possible.
+
+    Usage:
+        views = ViewCache()
+        for camera in cameras:
+            fractal = views.render(camera, Coloration.SMOOTH_TIME, limit=200)
+
+    :param exact: only copy the pixels whose sample point is the same float in
+        both views, so that render() gives exactly what compute() does. By
+        default, this is only the case of the kinds that are not in
+        CONSTANT_INSIDE_KINDS, and the pixels of the others are copied when
+        their sample points are the same up to the rounding. Exact mode
+        reuses a few percent of the view on a 2x zoom instead of a quarter,
+        so it gives almost no speedup once zoomed in, and often only part
+        of the overlap of a pan.
+    """
+
+    def __init__(self, exact=False):
+        self.exact = exact
+        self.camera = None
+        self.fractal = None
+        self.parameters = None
+        # Number of pixels copied from the previous view by the last render
+        self.reused = 0
+
+    def remember(self, camera: SimpleCamera, fractal, **parameters):
+        """Keep a view computed elsewhere, with the parameters given to compute()."""
+
+        self.camera = SimpleCamera(camera.size, camera.center, camera.height)
+        self.fractal = fractal
+        self.parameters = _parameters(**parameters)
+
+    def alignment(self, camera: SimpleCamera):
+        """
+        How the pixel grid of the camera lines up with the one of the last view.
+
+        :return: (scale_previous, scale, kx, ky) as described in _compute_reusing(),
+            or None if the grids do not line up.
+        """
+
+        last = self.camera
+        if last is None:
+            return None
+
+        ratio = camera.step / last.step
+        for zoom, scales in ZOOM_SCALES.items():
+            if abs(ratio - zoom) < PIXEL_TOLERANCE:
+                break
+        else:
+            return None
+
+        shift = (camera.bottomleft - last.bottomleft) / min(camera.step, last.step)
+        kx, ky = round(shift.real), round(shift.imag)
+        if abs(shift - complex(kx, ky)) > PIXEL_TOLERANCE:
+            return None
+        return (*scales, kx, ky)
+
+    def can_reuse(self, camera: SimpleCamera, **parameters):
+        """Whether part of the last view can be reused for the camera."""
+
+        return (
+            _parameters(**parameters) == self.parameters
+            and choose_engine(camera) is Engine.TILES
+            and self.alignment(camera) is not None
+        )
+
+    def render(
+        self,
+        camera: SimpleCamera,
+        kind: Coloration,
+        limit=50,
+        bound=DEFAULT_BOUND,
+        julia=None,
+        check_inside=True,
+        periodicity=False,
+    ):
+        """
+        Compute the view of the camera, like compute() with the same parameters.
+
+        :return: a new array, the previous one is not modified.
+        """
+
+        parameters = _parameters(kind, limit, bound, julia, check_inside, periodicity)
+
+        if not self.can_reuse(camera, **parameters):
+            self.reused = 0
+            fractal = compute(camera, **parameters)
+            self.remember(camera, fractal, **parameters)
+            return fractal
+
+        escape_func = escape_function(kind, periodicity, julia=julia is not None)
+
+        # The rounding of the sample points is amplified by the chaotic orbits inside
+        exact = self.exact or kind not in CONSTANT_INSIDE_KINDS
+        scale_previous, scale, kx, ky = self.alignment(camera)
+        out = np.empty(camera.size)
+        w, h = out.shape
+        tiles = -(-w // DEFAULT_TILE_SIZE) * -(-h // DEFAULT_TILE_SIZE)
+        reused = np.zeros(tiles, dtype=np.int64)
+
+        with dynamic_scheduling():
+            _compute_reusing(
+                out,
+                self.fractal,
+                scale_previous,
+                scale,
+                kx,
+                ky,
+                exact,
+                self.camera.bottomleft,
+                self.camera.step,
+                escape_func,
+                camera.bottomleft,
+                camera.step,
+                limit,
+                bound,
+                julia,
+                check_inside and kind in CONSTANT_INSIDE_KINDS,
+                DEFAULT_TILE_SIZE,
+                tile_order(tiles),
+                reused,
+            )
+
+        self.reused = int(reused.sum())
+        logger.debug("Reused %s of %s pixels", self.reused, out.size)
+        self.remember(camera, out, **parameters)
+        return out
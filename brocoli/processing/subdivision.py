@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Mariani-Silver rectangle subdivision.
+
+The escape time is constant on large areas of the image, most notably on the
+inside of the set. Since the Mandelbrot set and the regions where the escape time
+is larger than a given value are simply connected, when the whole border of a
+rectangle has the same value, the inside of the rectangle has this value too
+and does not need to be iterated.
+
+Julia sets are only connected when their seed is in the Mandelbrot set. The
+others are dust, where a rectangle of constant border can surround islands of
+higher escape times, so compute() renders them with tiles, see connected_julia().
+
+This holds for the continuous set, but we only see it through pixels. Features
+thinner than half a pixel that cross the border of a rectangle can still be
+missed, which happens for a handful of pixels per million on random views.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+from .compute import escape_at
+
+# Rectangles smaller than this are iterated pixel by pixel
+MIN_RECT_SIZE = 6
+# Deep enough for rectangles up to 2**64 pixels
+STACK_SIZE = 128
+
+
+@njit(cache=True)
+def _sample(escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, h, x, y):
+    """
+    Value at the (not necessarily integer) pixel coordinates (x, y).
+
+    :return: the value and whether it was found in the main cardioid or bulb.
+    """
+
+    z0 = bottomleft + pixstep * complex(x, h - y - 1)
+    return escape_at(escape_func, z0, limit, bound, julia, check_inside)
+
+
+@njit(cache=True)
+def _pixel(out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x, y):
+    """Value of the pixel (x, y), computed only the first time it is needed."""
+
+    if not done[x, y]:
+        value, inside = _sample(
+            escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, out.shape[1], x, y
+        )
+        out[x, y] = value
+        skipped[0] += inside
+        done[x, y] = True
+
+    return out[x, y]
+
+
+@njit(cache=True)
+def _midpoints_uniform(
+    escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x0, y0, x1, y1, h, value
+):
+    """
+    Whether the points halfway between the border pixels of a rectangle all have the given value.
+
+    Thin filaments can cross the border between two pixels, and would be missed
+    when filling the rectangle. Checking the midpoints catches almost all of them.
+    """
+
+    for x in range(x0, x1):
+        for y in (y0, y1):
+            sample = _sample(
+                escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, h, x + 0.5, y
+            )
+            if sample[0] != value:
+                return False
+    for y in range(y0, y1):
+        for x in (x0, x1):
+            sample = _sample(
+                escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, h, x, y + 0.5
+            )
+            if sample[0] != value:
+                return False
+    return True
+
+
+@njit(cache=True)
+def _subdivide(
+    out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside, x0, y0, x1, y1
+):
+    """
+    Compute the rectangle of pixels [x0, x1] x [y0, y1] (inclusive) of out.
+
+    The pixels found in the main cardioid and bulb are counted in skipped[0].
+    :return: the number of pixels that were filled without iterating them.
+    """
+
+    args = (out, done, skipped, escape_func, bottomleft, pixstep, limit, bound, julia, check_inside)
+    stack = np.empty((STACK_SIZE, 4), np.int64)
+    stack[0] = x0, y0, x1, y1
+    top = 1
+    filled = 0
+
+    while top:
+        top -= 1
+        x0, y0, x1, y1 = stack[top]
+
+        # Trace the border of the rectangle
+        value = _pixel(*args, x0, y0)
+        uniform = True
+        for x in range(x0, x1 + 1):
+            a = _pixel(*args, x, y0)
+            b = _pixel(*args, x, y1)
+            uniform = uniform and a == value and b == value
+        for y in range(y0 + 1, y1):
+            a = _pixel(*args, x0, y)
+            b = _pixel(*args, x1, y)
+            uniform = uniform and a == value and b == value
+
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            # the border is the whole rectangle
+            continue
+
+        if uniform:
+            uniform = _midpoints_uniform(
+                escape_func,
+                bottomleft,
+                pixstep,
+                limit,
+                bound,
+                julia,
+                check_inside,
+                x0,
+                y0,
+                x1,
+                y1,
+                out.shape[1],
+                value,
+            )
+
+        if uniform:
+            for x in range(x0 + 1, x1):
+                for y in range(y0 + 1, y1):
+                    if not done[x, y]:
+                        out[x, y] = value
+                        done[x, y] = True
+                        filled += 1
+        elif x1 - x0 <= MIN_RECT_SIZE and y1 - y0 <= MIN_RECT_SIZE:
+            for x in range(x0 + 1, x1):
+                for y in range(y0 + 1, y1):
+                    _pixel(*args, x, y)
+        elif x1 - x0 >= y1 - y0:
+            # Split along the longest side, the two halves share the middle line
+            mid = (x0 + x1) // 2
+            stack[top] = x0, y0, mid, y1
+            stack[top + 1] = mid, y0, x1, y1
+            top += 2
+        else:
+            mid = (y0 + y1) // 2
+            stack[top] = x0, y0, x1, mid
+            stack[top + 1] = x0, mid, x1, y1
+            top += 2
+
+    return filled
+
+
+@njit(parallel=True, cache=True)
+def _compute_subdivision(
+    out,
+    done,
+    escape_func,
+    bottomleft,
+    pixstep,
+    limit,
+    bound,
+    julia,
+    check_inside,
+    tile_size,
+    order,
+    filled,
+    skipped,
+):
+    """
+    Same as _compute, but each tile is computed by rectangle subdivision.
+
+    `done` is a boolean array of the shape of `out`, initially False, and the
+    number of pixels filled without iteration in each tile is written in `filled`.
+    """
+
+    w, h = out.shape
+    tiles_x = (w + tile_size - 1) // tile_size
+    for k in prange(order.size):
+        tile = order[k]
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+        x1 = min(x0 + tile_size, w) - 1
+        y1 = min(y0 + tile_size, h) - 1
+
+        filled[tile] = _subdivide(
+            out,
+            done,
+            skipped[tile : tile + 1],
+            escape_func,
+            bottomleft,
+            pixstep,
+            limit,
+            bound,
+            julia,
+            check_inside,
+            x0,
+            y0,
+            x1,
+            y1,
+        )
@@ -11,8 +11,11 @@ from kivymd.uix.menu import MDDropdownMenu
 from .dispatcher_extension import EventDispatcherExtension
 from .base import MyTab
 from ..processing.camera import SimpleCamera
-from ..processing.compute import compute, Coloration
+from ..processing.compute import compute, Coloration, Engine, choose_engine
+from ..processing.orbit_stats import OrbitStats
+from ..processing.progressive import compute_progressive
 from ..processing.random_fractal import random_position
+from ..processing.reuse import ViewCache
 
 
 class EventDispatcherCamera(SimpleCamera, EventDispatcherExtension):
@@ -41,12 +44,20 @@ class CameraTab(MyTab):
         EventDispatcherCamera((42, 42), -0.75, 3), rebind=True
     )
     fractal = ObjectProperty(force_dispatch=True, allownone=True)
+    # Whether the fractal is a pass of a progressive render, updated in place by the next one
+    preview = BooleanProperty(False)
     julia_active = BooleanProperty(False)
     julia_c = ObjectProperty(0j)
+    # Show coarse previews of the view while it is computed
+    progressive = BooleanProperty(True)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.saved_camera = SimpleCamera((2, 2))
+        self.passes = None
+        self.views = ViewCache()
+        # Statistics of the orbits of the view, once its kind or limit was changed
+        self.orbits = OrbitStats()
 
         # self.process()
         Clock.schedule_once(self.finish_init)
@@ -132,13 +143,76 @@ class CameraTab(MyTab):
             print(f"Warning: CameraTab had unknown kwargs {tuple(kwargs.keys())}.")
 
         print("Computing fractal", camera, "steps:", steps)
-        fractal = compute(camera, kind, limit=steps, bound=bound, julia=julia_c)
+
+        parameters = dict(kind=kind, limit=steps, bound=bound, julia=julia_c)
+        if cache and (
+            self.orbits.holds(camera, steps, bound, julia_c)
+            or self.orbits.can_resume(camera, steps, bound, julia_c)
+            or self.same_orbits(camera, parameters)
+        ):
+            # The orbits are recorded the first time, then each kind is
+            # derived from them without iterating, and a higher limit only
+            # iterates the pixels that did not escape
+            self.passes = None
+            self.preview = False
+            self.fractal = compute(camera, **parameters, orbits=self.orbits)
+            self.views.remember(camera, self.fractal, **parameters)
+            return
+
+        if cache and self.views.can_reuse(camera, **parameters):
+            # Only the part of the view that was not visible is computed
+            self.passes = None
+            self.preview = False
+            self.fractal = self.views.render(camera, **parameters)
+            return
+
+        if cache and self.progressive and choose_engine(camera) is Engine.TILES:
+            # One pass per frame, so the previews are shown
+            self.passes = compute_progressive(camera, **parameters)
+            self.next_pass(self.passes, camera, parameters)
+            return
+
+        self.passes = None
+        fractal = compute(camera, **parameters)
 
         if cache:
+            self.views.remember(camera, fractal, **parameters)
+            self.preview = False
             self.fractal = fractal
         else:
             return fractal
 
+    def same_orbits(self, camera, parameters):
+        """Whether the last view is the same as this one, but for its kind or a higher limit."""
+
+        last = self.views.parameters
+        return (
+            last is not None
+            and last["limit"] <= parameters["limit"]
+            and (last["kind"], last["limit"]) != (parameters["kind"], parameters["limit"])
+            and all(last[key] == parameters[key] for key in ("bound", "julia"))
+            and tuple(self.views.camera.size) == tuple(camera.size)
+            and self.views.alignment(camera) == (1, 1, 0, 0)
+            and choose_engine(camera) is Engine.TILES
+        )
+
+    def next_pass(self, passes, camera, parameters, *args):
+        """Show the next pass of a progressive render, unless a new one started."""
+
+        if passes is not self.passes:
+            return
+
+        try:
+            fractal = next(passes)
+        except StopIteration:
+            self.passes = None
+            self.preview = False
+            self.views.remember(camera, self.fractal, **parameters)
+        else:
+            self.preview = True
+            self.fractal = fractal
+            Clock.schedule_once(lambda dt: self.next_pass(passes, camera, parameters))
+
     def on_view_size_change(self, new_size):
         self.camera.size = int(new_size[0]), int(new_size[1])
 
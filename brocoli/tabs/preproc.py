@@ -6,7 +6,7 @@ from kivy.properties import (
     ObjectProperty,
 )
 
-from ..processing.preprocess import preprocess
+from ..processing.preprocess import PreprocessStats, preprocess_stats
 from .base import MyTab
 
 
@@ -18,6 +18,8 @@ class PreprocTab(MyTab):
     any = ReferenceListProperty(bins, steps_power, normalize_quantiles)
 
     fractal = ObjectProperty(force_dispatch=True, allownone=True)
+    # The fractal is a pass of a progressive render, whose array the next pass updates
+    preview = BooleanProperty(False)
     preproc_fractal = ObjectProperty(force_dispatch=True, allownone=True)
 
     def __init__(self, **kwargs):
@@ -51,10 +53,10 @@ class PreprocTab(MyTab):
             print("Warning: GradientTab.process called without fractal.")
             return
 
-        fractal = fractal.copy()
-
-        fractal = preprocess(
-                fractal,
+        # The statistics of the field are found once, then each change of the
+        # sliders only remaps it. Those of the previews would be wrong after the next pass.
+        stats = PreprocessStats(fractal) if self.preview else preprocess_stats(fractal)
+        fractal = stats.preprocess(
                 bins=bins,
                 norm_quantiles=norm_quantiles,
                 steps_power=steps_power
@@ -0,0 +1,109 @@
+from cmath import phase
+from math import log, sin
+
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import DEFAULT_BOUND, Coloration, Engine, compute
+
+SIZE = (24, 18)
+LIMIT = 100
+
+
+# The escape functions as they were before the iterates were kept in tuples,
+# with a list used as a ring buffer, in plain python
+
+
+def push(zs, head, value):
+    zs[head] = value
+    return (head + 1) % len(zs)
+
+
+def smooth_coef(z, bound):
+    z = abs(z)
+    return 1 + 1 / log(2) * log(log(bound) / abs(log(z))) if z != 1 else 0
+
+
+def lerp(a, b, t):
+    return a * (1.0 - t) + b * t
+
+
+def addend(order):
+    def decorator(t):
+        def func(z0, c, limit, bound=DEFAULT_BOUND):
+            zs = [0j] * order
+            head = push(zs, 0, z0)
+            s = s1 = i = 0
+
+            sign = 1
+            for i in range(limit):
+                head = push(zs, head, zs[head - 1] * zs[head - 1] + c)
+
+                if i >= order - 1:
+                    s1, s = s, s + t(zs, head)
+
+                if abs(zs[head - 1]) > bound:
+                    break
+            else:
+                sign = -1
+
+            S = s / (i - order + 2) if i > order - 2 else 0
+            S1 = s1 / (i - order + 1) if i > order - 1 else 0
+            d = smooth_coef(zs[head - 1], bound)
+            return lerp(S1, S, d) * sign
+
+        return func
+
+    return decorator
+
+
+@addend(3)
+def curvature(zs, head):
+    if zs[head - 2] == zs[head]:
+        return 0
+    angle = (zs[head - 1] - zs[head - 2]) / (zs[head - 2] - zs[head])
+    return abs(phase(angle))
+
+
+@addend(1)
+def stripe(zs, head):
+    return 1 / 2 * sin(4 * phase(zs[0])) + 1 / 2
+
+
+def angle(z0, c, limit, bound=DEFAULT_BOUND):
+    z = z0
+    orbit = [z]
+    for i in range(1, limit):
+        z = z * z + c
+        orbit.append(z)
+        if abs(z) > 2:
+            break
+
+    s = 0j
+    for z in orbit:
+        s += z
+    return -abs(s) / len(orbit)
+
+
+REFERENCES = {
+    Coloration.ANGLE: angle,
+    Coloration.AVG_CURVATURE: curvature,
+    Coloration.AVG_STRIDE: stripe,
+}
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+@pytest.mark.parametrize("kind", REFERENCES.keys(), ids=str)
+def test_values_are_the_list_ones(kind, julia):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    reference = REFERENCES[kind]
+
+    expected = np.empty(SIZE)
+    for x in range(SIZE[0]):
+        for y in range(SIZE[1]):
+            z0 = camera.bottomleft + camera.step * complex(x, SIZE[1] - y - 1)
+            expected[x, y] = reference(z0, z0 if julia is None else julia, LIMIT)
+
+    values = compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES)
+    np.testing.assert_array_equal(values, expected)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from brocoli.fractal import Fractal
+from brocoli.processing.antialias import find_edges, supersample
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, compute
+
+SIZE = (64, 48)
+LIMIT = 100
+PER_SIDE = 3
+
+
+def test_edges_of_a_step():
+    values = np.full((8, 6), 0.2)
+    values[3, 2] = 0.8
+    values[6, :] = -0.2
+
+    expected = np.zeros(values.shape, dtype=bool)
+    # The pixel and its four neighbours, not the diagonal ones
+    expected[2:5, 2] = True
+    expected[3, 1:4] = True
+    # Both sides of the border of the inside, however close the values
+    expected[5:8, :] = True
+
+    np.testing.assert_array_equal(find_edges(values, threshold=0.5), expected)
+
+
+def test_edges_of_the_mandelbrot_set():
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    inside = compute(camera, Coloration.SMOOTH_TIME, limit=LIMIT) < 0
+    edges = find_edges(np.where(inside, -1.0, 0.0))
+
+    border = np.zeros(SIZE, dtype=bool)
+    border[:-1] |= inside[:-1] != inside[1:]
+    border[1:] |= inside[:-1] != inside[1:]
+    border[:, :-1] |= inside[:, :-1] != inside[:, 1:]
+    border[:, 1:] |= inside[:, :-1] != inside[:, 1:]
+
+    assert border.any()
+    np.testing.assert_array_equal(edges, border)
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+@pytest.mark.parametrize("kind", [Coloration.TIME, Coloration.SMOOTH_TIME], ids=str)
+def test_batched_samples_are_the_escape_functions(kind, julia):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    mask = np.zeros(SIZE, dtype=bool)
+    mask[10:20, 5:40] = True
+
+    samples = supersample(camera, kind, mask, PER_SIDE, limit=LIMIT, julia=julia)
+    assert samples.shape == (mask.sum(), PER_SIDE ** 2)
+
+    # With periodicity checking, the samples go through the escape functions
+    # instead, which give the same values
+    periodic = supersample(camera, kind, mask, PER_SIDE, limit=LIMIT, julia=julia, periodicity=True)
+    np.testing.assert_array_equal(samples, periodic)
+
+
+@pytest.mark.parametrize("parameters", [{}, dict(bins=3), dict(normalize_quantiles=True)], ids=str)
+def test_only_the_edges_change(parameters):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    fractal = Fractal(camera, limit=LIMIT, gradient_points=[(0, 0, 0), (255, 169, 0)], **parameters)
+    values = compute(camera, **fractal.compute_parameters())
+
+    plain = fractal.colorize(fractal.preprocess(values.copy()))
+    fractal.antialias = PER_SIDE
+    antialiased = fractal.antialiased_colors(values)
+
+    pixels = fractal.preprocess(values.copy())
+    edges = find_edges(pixels, fractal.antialias_threshold)
+    assert 0 < edges.sum() < edges.size
+    np.testing.assert_array_equal(antialiased[~edges], plain[~edges])
+    assert (antialiased[edges] != plain[edges]).any()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import BATCHED_KINDS, ComputeStats, Engine, compute
+
+SIZE = (64, 48)
+LIMIT = 200
+
+# (center, height, julia)
+VIEWS = {
+    "mandelbrot": (-0.75, 2.5, None),
+    "seahorse valley": (-0.7436 + 0.1318j, 0.01, None),
+    "julia": (0, 3, -0.8 + 0.156j),
+}
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("kind", sorted(BATCHED_KINDS, key=lambda kind: kind.name), ids=lambda kind: kind.name)
+def test_batched_is_tiles(kind, view):
+    center, height, julia = view
+    camera = SimpleCamera(SIZE, center, height)
+
+    np.testing.assert_array_equal(
+        compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.BATCHED),
+        compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES),
+    )
+
+
+@pytest.mark.parametrize("kind", sorted(BATCHED_KINDS, key=lambda kind: kind.name), ids=lambda kind: kind.name)
+def test_batched_records_the_tiles(kind):
+    camera = SimpleCamera(SIZE, -0.75, 2.5)
+    batched, tiles = ComputeStats(), ComputeStats()
+    compute(camera, kind, limit=LIMIT, engine=Engine.BATCHED, stats=batched)
+    compute(camera, kind, limit=LIMIT, engine=Engine.TILES, stats=tiles)
+
+    assert batched.tile_size == tiles.tile_size
+    assert batched.tile_costs.shape == tiles.tile_costs.shape
+    assert (batched.tile_costs > 0).all()
+    assert batched.skipped == tiles.skipped > 0
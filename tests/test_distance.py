@@ -0,0 +1,137 @@
+from decimal import Decimal, localcontext
+from math import log
+
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import (
+    DEFAULT_BOUND,
+    Coloration,
+    ComputeStats,
+    Engine,
+    compute,
+    escape_distance,
+    escape_distance_julia,
+)
+from brocoli.processing.orbit_stats import OrbitStats
+
+SIZE = (64, 48)
+LIMIT = 100
+PIXEL = (20, 14)
+
+
+@pytest.fixture
+def camera():
+    return SimpleCamera(SIZE, 0, 3)
+
+
+@pytest.fixture
+def seed(camera):
+    """A seed outside the set that is exactly the sample of PIXEL."""
+
+    x, y = PIXEL
+    seed = camera.bottomleft + camera.step * complex(x, SIZE[1] - y - 1)
+    assert escape_distance_julia(seed, seed, LIMIT) != escape_distance(seed, seed, LIMIT) > 0
+    return seed
+
+
+@pytest.mark.parametrize("periodicity", [False, True])
+@pytest.mark.parametrize("engine", [Engine.TILES, Engine.DISTANCE_FILL])
+def test_julia_pixel_on_the_seed(camera, seed, engine, periodicity):
+    fractal = compute(
+        camera, Coloration.DISTANCE, limit=LIMIT, julia=seed, engine=engine, periodicity=periodicity
+    )
+    assert fractal[PIXEL] == escape_distance_julia(seed, seed, LIMIT)
+
+
+def test_julia_orbits_on_the_seed(camera, seed):
+    fractal = compute(camera, Coloration.DISTANCE, limit=LIMIT, julia=seed, orbits=OrbitStats())
+    assert fractal[PIXEL] == escape_distance_julia(seed, seed, LIMIT)
+
+
+def decimal_distance(z0, c, limit, julia):
+    """
+    The distance estimate of compute(), from a Decimal iteration.
+
+    The derivative of z with respect to the pixel is the central finite
+    difference of the orbits of two points around it, with 60 digits.
+    """
+
+    def square_plus(z, c):
+        (x, y), (cx, cy) = z, c
+        return x * x - y * y + cx, 2 * x * y + cy
+
+    def orbit(z, c, steps):
+        for _ in range(steps):
+            z = square_plus(z, c)
+        return z
+
+    with localcontext() as context:
+        context.prec = 60
+        h = Decimal("1e-25")
+        z0 = (Decimal(z0.real), Decimal(z0.imag))
+        c = (Decimal(c.real), Decimal(c.imag))
+        bound = Decimal(DEFAULT_BOUND) ** 2
+
+        z = z0
+        for i in range(1, limit):
+            z = square_plus(z, c)
+            if z[0] ** 2 + z[1] ** 2 > bound:
+                break
+        else:
+            return -limit
+
+        # The pixel moves z0 for the Julia sets, and c with z0 for the Mandelbrot set
+        before = (z0[0] - h, z0[1])
+        after = (z0[0] + h, z0[1])
+        if julia:
+            before, after = orbit(before, c, i), orbit(after, c, i)
+        else:
+            before, after = orbit(before, before, i), orbit(after, after, i)
+        dz = complex((after[0] - before[0]) / (2 * h), (after[1] - before[1]) / (2 * h))
+
+        absz = abs(complex(z[0], z[1]))
+        return 0.5 * absz * log(absz) / abs(dz)
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+def test_distance_is_the_decimal_one(julia):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    fractal = compute(camera, Coloration.DISTANCE, limit=LIMIT, julia=julia, engine=Engine.TILES)
+
+    checked = 0
+    for x in range(0, SIZE[0], 5):
+        for y in range(0, SIZE[1], 5):
+            z0 = camera.bottomleft + camera.step * complex(x, SIZE[1] - y - 1)
+            expected = decimal_distance(z0, z0 if julia is None else julia, LIMIT, julia is not None)
+            assert fractal[x, y] == pytest.approx(expected, rel=1e-6)
+            checked += expected > 0
+    assert checked > 50
+
+
+# (center, height, julia) of views that are mostly outside
+FILLED_VIEWS = {
+    "mandelbrot": (-0.75, 3.5, None),
+    "douady rabbit": (0, 3, -0.123 + 0.745j),
+}
+# Largest relative error of the distances that the fill interpolates
+FILL_TOLERANCE = 0.02
+
+
+@pytest.mark.parametrize("view", FILLED_VIEWS.values(), ids=FILLED_VIEWS.keys())
+def test_distance_fill_is_close_to_tiles(view):
+    center, height, julia = view
+    camera = SimpleCamera((128, 96), center, height)
+    stats = ComputeStats()
+
+    parameters = dict(kind=Coloration.DISTANCE, limit=LIMIT, julia=julia)
+    filled = compute(camera, engine=Engine.DISTANCE_FILL, stats=stats, **parameters)
+    expected = compute(camera, engine=Engine.TILES, **parameters)
+
+    assert stats.skipped > stats.main_components
+    outside = expected > 0
+    assert np.count_nonzero(filled[outside] != expected[outside]) > 0
+    # The inside is filled with its exact value
+    np.testing.assert_array_equal(filled[~outside], expected[~outside])
+    np.testing.assert_allclose(filled[outside], expected[outside], rtol=FILL_TOLERANCE, atol=0)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from brocoli.farm import Farm, split
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, Engine, compute
+
+SIZE = (64, 48)
+LIMIT = 100
+# Not a divisor of the size, so the last tiles are smaller
+TILE_SIZE = 20
+
+ENGINES = [None, Engine.TILES, Engine.BATCHED, Engine.DOUBLE_DOUBLE, Engine.PERTURBATION]
+
+
+def stitched(camera, **parameters):
+    """The view of the camera, computed window by window."""
+
+    out = np.empty(camera.size)
+    for x, y, w, h in split(camera, TILE_SIZE):
+        out[x : x + w, y : y + h] = compute(camera, window=(x, y, w, h), **parameters)
+    return out
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+@pytest.mark.parametrize("engine", ENGINES, ids=str)
+@pytest.mark.parametrize("kind", [Coloration.SMOOTH_TIME, Coloration.AVG_CURVATURE], ids=str)
+def test_windows_are_the_whole_view(kind, engine, julia):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    parameters = dict(kind=kind, limit=LIMIT, julia=julia, engine=engine)
+
+    np.testing.assert_array_equal(stitched(camera, **parameters), compute(camera, **parameters))
+
+
+def test_split_covers_the_view():
+    camera = SimpleCamera(SIZE)
+    covered = np.zeros(SIZE, dtype=int)
+    for x, y, w, h in split(camera, TILE_SIZE):
+        assert 0 < w <= TILE_SIZE and 0 < h <= TILE_SIZE
+        covered[x : x + w, y : y + h] += 1
+
+    assert (covered == 1).all()
+
+
+def test_farm_is_the_whole_view():
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    parameters = dict(kind=Coloration.SMOOTH_TIME, limit=LIMIT)
+
+    with Farm() as farm:
+        farm.start_workers(2, threads=1)
+        values = farm.compute(camera, TILE_SIZE, **parameters)
+
+    np.testing.assert_array_equal(values, compute(camera, **parameters))
@@ -0,0 +1,130 @@
+import io
+
+import numpy as np
+import pytest
+
+from brocoli.processing import formulas
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import DEFAULT_BOUND, Coloration, Engine, compute
+from brocoli.processing.formulas import (
+    load_plugins,
+    plugin_escape_function,
+    register_coloring,
+    register_formula,
+)
+
+SIZE = (32, 24)
+LIMIT = 100
+
+PLUGINS = """
+formulas:
+  square: z * z + c
+  cubic: z ** 3 + c
+colorings:
+  stripes:
+    order: 1
+    term: 0.5 * sin(4 * phase(zs[head - 1])) + 0.5
+  spiral:
+    term: 0.5 * sin(8 * phase(zs[head - 1])) + 0.5
+"""
+
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    """Register the plugins of each test apart, and write their kernels in a temporary directory."""
+
+    monkeypatch.setattr(formulas, "KERNELS_DIR", tmp_path)
+    monkeypatch.setattr(formulas, "FORMULAS", {})
+    monkeypatch.setattr(formulas, "COLORINGS", {})
+    monkeypatch.setattr(formulas, "_escape_functions", {})
+
+
+@pytest.fixture
+def camera():
+    return SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+
+
+def cubic_time(c, limit):
+    """Escape time of z -> z^3 + c, in python."""
+
+    z = c
+    for i in range(1, limit):
+        z = z ** 3 + c
+        if abs(z) > DEFAULT_BOUND:
+            return i
+    return -limit
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+@pytest.mark.parametrize("kind", [kind for kind in Coloration if kind is not Coloration.DISTANCE], ids=str)
+def test_square_formula_is_compute(camera, kind, julia):
+    register_formula("square", "z * z + c")
+
+    np.testing.assert_array_equal(
+        compute(camera, kind, limit=LIMIT, julia=julia, formula="square"),
+        compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES),
+    )
+
+
+def test_formula_function(camera):
+    def cubic(z, c):
+        return z ** 3 + c
+
+    formula = register_formula("cubic", cubic)
+    assert formulas.FORMULAS["cubic"] is formula
+    assert "z ** 3 + c" in formula.source
+
+    values = compute(camera, Coloration.TIME, limit=LIMIT, formula="cubic")
+
+    for x, y in [(0, 0), (5, 20), (16, 12), (31, 23), (20, 3)]:
+        c = camera.bottomleft + camera.step * complex(x, SIZE[1] - y - 1)
+        assert values[x, y] == cubic_time(c, LIMIT)
+
+
+@pytest.mark.parametrize("periodicity", [False, True])
+def test_coloring_is_the_addend_one(camera, periodicity):
+    # The same term as escape_stripe
+    coloring = register_coloring("stripes", "0.5 * sin(4 * phase(zs[head - 1])) + 0.5")
+    assert formulas.COLORINGS["stripes"] is coloring
+    assert coloring.order == 1
+
+    np.testing.assert_allclose(
+        compute(camera, "stripes", limit=LIMIT, periodicity=periodicity),
+        compute(camera, Coloration.AVG_STRIDE, limit=LIMIT, periodicity=periodicity),
+        rtol=1e-12,
+    )
+
+
+def test_load_plugins(camera):
+    load_plugins(io.StringIO(PLUGINS))
+
+    assert set(formulas.FORMULAS) == {"square", "cubic"}
+    assert set(formulas.COLORINGS) == {"stripes", "spiral"}
+    assert formulas.COLORINGS["spiral"].order == 1
+
+    np.testing.assert_allclose(
+        compute(camera, "stripes", limit=LIMIT, formula="square"),
+        compute(camera, Coloration.AVG_STRIDE, limit=LIMIT),
+        rtol=1e-12,
+    )
+    assert compute(camera, Coloration.TIME, limit=LIMIT, formula="cubic")[5, 20] == cubic_time(
+        camera.bottomleft + camera.step * complex(5, SIZE[1] - 21), LIMIT
+    )
+
+
+def test_empty_plugins():
+    load_plugins(io.StringIO(""))
+    assert formulas.FORMULAS == formulas.COLORINGS == {}
+
+
+def test_kernels_change_with_brocoli(tmp_path, monkeypatch):
+    register_formula("cubic", "z ** 3 + c")
+    escape_func = plugin_escape_function(Coloration.TIME, "cubic")
+    assert plugin_escape_function(Coloration.TIME, "cubic") is escape_func
+    assert len(list(tmp_path.glob("plugin_*.py"))) == 1
+
+    # Another version of brocoli, whose escape functions may differ
+    monkeypatch.setattr(formulas, "source_fingerprint", lambda: "another version")
+
+    assert plugin_escape_function(Coloration.TIME, "cubic") is not escape_func
+    assert len(list(tmp_path.glob("plugin_*.py"))) == 2
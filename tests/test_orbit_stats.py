@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, Engine, compute
+from brocoli.processing.orbit_stats import OrbitStats
+
+SIZE = (64, 48)
+LIMIT = 100
+
+# (center, height, julia)
+VIEWS = {
+    "mandelbrot": (-0.75 + 0.1j, 2.5, None),
+    "seahorse valley": (-0.7436 + 0.1318j, 0.01, None),
+    "julia": (0, 3, -0.8 + 0.156j),
+}
+KINDS = list(Coloration)
+
+
+@pytest.fixture(scope="module", params=VIEWS.values(), ids=VIEWS.keys())
+def view(request):
+    """The view and its orbits, recorded once for every kind."""
+
+    center, height, julia = request.param
+    camera = SimpleCamera(SIZE, center, height)
+    orbits = OrbitStats()
+    orbits.record(camera, LIMIT, julia=julia)
+    return camera, julia, orbits
+
+
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_values_are_compute(view, kind):
+    camera, julia, orbits = view
+
+    np.testing.assert_array_equal(
+        orbits.values(kind), compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES)
+    )
+
+
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_compute_with_orbits(kind):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    orbits = OrbitStats()
+    compute(camera, Coloration.SMOOTH_TIME, limit=LIMIT, orbits=orbits)
+
+    np.testing.assert_array_equal(
+        compute(camera, kind, limit=LIMIT, orbits=orbits),
+        compute(camera, kind, limit=LIMIT, engine=Engine.TILES),
+    )
+
+
+@pytest.mark.parametrize(
+    "kinds", [None, {Coloration.TIME, Coloration.DISTANCE}], ids=["all kinds", "constant inside"]
+)
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+def test_resume_is_record(julia, kinds):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    resumed = OrbitStats(kinds)
+    resumed.record(camera, LIMIT // 4, julia=julia)
+    assert resumed.can_resume(camera, LIMIT, julia=julia)
+    resumed.resume(camera, LIMIT)
+
+    for kind in resumed.kinds:
+        np.testing.assert_array_equal(
+            resumed.values(kind), compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES)
+        )
+
+
+def test_compute_resumes_the_orbits():
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    orbits = OrbitStats()
+    compute(camera, Coloration.TIME, limit=LIMIT // 2, orbits=orbits)
+    assert orbits.can_resume(camera, LIMIT)
+
+    np.testing.assert_array_equal(
+        compute(camera, Coloration.AVG_CURVATURE, limit=LIMIT, orbits=orbits),
+        compute(camera, Coloration.AVG_CURVATURE, limit=LIMIT, engine=Engine.TILES),
+    )
+    assert orbits.limit == LIMIT
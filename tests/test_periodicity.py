@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, Engine, compute, escape_periodic
+
+SIZE = (64, 48)
+LIMIT = 500
+KINDS = [Coloration.TIME, Coloration.SMOOTH_TIME, Coloration.DISTANCE]
+
+# (center, height, julia) of views that are mostly inside
+VIEWS = {
+    "main cardioid": (-0.2, 1.2, None),
+    "period-2 bulb": (-1 + 0.1j, 0.5, None),
+    "period-3 bulb": (-0.1226 + 0.7449j, 0.15, None),
+    "douady rabbit": (0, 0.8, -0.123 + 0.745j),
+}
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_periodicity_gives_the_same_values(kind, view):
+    center, height, julia = view
+    camera = SimpleCamera(SIZE, center, height)
+    # Without skipping the main components, so that their orbits are iterated
+    parameters = dict(kind=kind, limit=LIMIT, julia=julia, engine=Engine.TILES, check_inside=False)
+
+    periodic = compute(camera, periodicity=True, **parameters)
+    expected = compute(camera, periodicity=False, **parameters)
+
+    assert np.mean(expected < 0) > 0.5
+    # The inside gets the inside value, -limit
+    np.testing.assert_array_equal(periodic[expected < 0], -LIMIT)
+    np.testing.assert_array_equal(periodic, expected)
+
+
+@pytest.mark.parametrize("z", [-0.2 + 0.1j, -1 + 0.05j, -0.12 + 0.75j])
+def test_interior_orbits_stop_early(z):
+    # A limit that would take long to reach pixel by pixel
+    assert escape_periodic(z, z, 10 ** 9) == -(10 ** 9)
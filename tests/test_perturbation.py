@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, ComputeStats, Engine, compute
+
+SIZE = (64, 48)
+LIMIT = 100
+# Distance estimation is computed with floats by compute()
+KINDS = [kind for kind in Coloration if kind is not Coloration.DISTANCE]
+# The orbits that never escape are chaotic: the rounding errors of the
+# offsets change the reductions of the whole orbit
+CHAOTIC_INSIDE_KINDS = {Coloration.ANGLE, Coloration.AVG_CURVATURE}
+
+# (center, height, julia)
+VIEWS = {
+    "mandelbrot": (-0.75 + 0.1j, 2.5, None),
+    "seahorse valley": (-0.7436 + 0.1318j, 0.01, None),
+    "off center": (0.1 + 0.2j, 1, None),
+    "julia": (0, 3, -0.8 + 0.156j),
+    "julia zoom": (0.1 + 0.2j, 0.5, -0.8 + 0.156j),
+}
+
+
+def assert_close(values, expected, kind, rtol):
+    """The values agree with the expected ones, only outside for the chaotic kinds."""
+
+    assert ((values < 0) == (expected < 0)).all()
+    if kind in CHAOTIC_INSIDE_KINDS:
+        outside = expected >= 0
+        values, expected = values[outside], expected[outside]
+    np.testing.assert_allclose(values, expected, rtol=rtol, atol=rtol)
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_shallow_perturbation_is_tiles(kind, view):
+    center, height, julia = view
+    camera = SimpleCamera(SIZE, center, height)
+    parameters = dict(kind=kind, limit=LIMIT, julia=julia)
+
+    values = compute(camera, engine=Engine.PERTURBATION, **parameters)
+    expected = compute(camera, engine=Engine.TILES, **parameters)
+
+    if kind is Coloration.TIME:
+        np.testing.assert_array_equal(values, expected)
+    assert_close(values, expected, kind, 1e-6)
+
+
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_rebased_perturbation_is_double_double(kind):
+    # Just right of the cusp of the period-3 minibrot, most orbits
+    # come back close to 0 and are rebased
+    camera = SimpleCamera(SIZE, "-1.7497591451303665", 1e-20)
+    stats = ComputeStats()
+
+    values = compute(camera, kind, limit=500, engine=Engine.PERTURBATION, stats=stats)
+    expected = compute(camera, kind, limit=500, engine=Engine.DOUBLE_DOUBLE)
+
+    assert stats.rebases > 0
+    assert stats.series_skip > 0
+    assert_close(values, expected, kind, 1e-8)
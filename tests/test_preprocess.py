@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, compute
+from brocoli.processing.preprocess import PreprocessStats, normalize_quantiles, preprocess, preprocess_chunked
+
+SIZE = (64, 48)
+LIMIT = 100
+
+# (bins, norm_quantiles, steps_power)
+PARAMETERS = [
+    (1, False, 1),
+    (1, False, 2.5),
+    (1, False, 0.3),
+    (1, False, -1),
+    (3, False, 1),
+    (1, True, 1),
+    (4, True, 0.5),
+]
+
+
+@pytest.fixture(scope="module")
+def field():
+    return compute(SimpleCamera(SIZE, -0.75 + 0.1j, 2.5), Coloration.SMOOTH_TIME, limit=LIMIT)
+
+
+def sorted_quantiles(surf, nb, exclude_inside=True):
+    """normalize_quantiles() as it was, with a full sort and one mask per quantile."""
+
+    values = np.sort(surf.flatten())
+    indices = (np.linspace(0, 1, nb, endpoint=False) * values.size).astype(int)
+    steps = values[indices]
+    zero = steps.searchsorted(0, "right") if exclude_inside else 0
+
+    new = np.empty(surf.shape)
+    for part, bound in enumerate(steps):
+        new[surf >= bound] = part - zero
+
+    return new
+
+
+@pytest.mark.parametrize("exclude_inside", [True, False])
+@pytest.mark.parametrize("nb", [7, 1000])
+@pytest.mark.parametrize("kind", [Coloration.TIME, Coloration.SMOOTH_TIME, Coloration.AVG_CURVATURE], ids=str)
+def test_quantiles_are_the_sorted_ones(kind, nb, exclude_inside):
+    # The escape times have many ties, and the curvature negative values inside
+    surf = compute(SimpleCamera(SIZE, -0.75 + 0.1j, 2.5), kind, limit=LIMIT)
+
+    np.testing.assert_array_equal(
+        normalize_quantiles(surf, nb, exclude_inside), sorted_quantiles(surf, nb, exclude_inside)
+    )
+
+
+@pytest.mark.parametrize("parameters", PARAMETERS, ids=str)
+def test_stats_are_preprocess(field, parameters):
+    stats = PreprocessStats(field)
+    expected = preprocess(field.copy(), *parameters)
+
+    np.testing.assert_array_equal(stats.preprocess(*parameters), expected)
+    # and again with the statistics found for the first call
+    np.testing.assert_array_equal(stats.preprocess(*parameters), expected)
+
+
+def test_stats_sort_only_when_needed(field):
+    stats = PreprocessStats(field)
+    stats.preprocess(steps_power=2)
+    assert stats._sorted is None
+
+    stats.preprocess(norm_quantiles=True)
+    assert stats._sorted is not None
+
+
+@pytest.mark.parametrize("power", [1, 2])
+def test_stats_of_large_fields_with_bins(power):
+    # The bins are found on a sample, and the extrema without sorting the field
+    field = np.random.default_rng(1).normal(size=(1100, 1000))
+    stats = PreprocessStats(field)
+
+    expected = preprocess(field.copy(), 3, False, power)
+
+    np.testing.assert_array_equal(stats.preprocess(bins=3, steps_power=power), expected)
+    assert stats._sorted is None
+
+
+@pytest.mark.parametrize("parameters", PARAMETERS, ids=str)
+def test_chunked_memmap_in_place_is_preprocess(field, parameters, tmp_path):
+    expected = preprocess(field.copy(), *parameters)
+
+    memmap = np.memmap(tmp_path / "field.dat", dtype=float, mode="w+", shape=field.shape)
+    memmap[:] = field
+    # Chunks of 3 rows, and out is the fractal itself
+    result = preprocess_chunked(memmap, memmap, *parameters, chunk_size=3 * field.shape[1])
+
+    assert result is memmap
+    np.testing.assert_array_equal(np.fromfile(tmp_path / "field.dat").reshape(field.shape), expected)
+
+
+@pytest.mark.parametrize("parameters", PARAMETERS, ids=str)
+def test_chunked_large_field_is_close_to_preprocess(parameters):
+    # The bins and quantiles are estimated on a quarter of the field
+    field = compute(SimpleCamera((320, 240), -0.75 + 0.1j, 2.5), Coloration.SMOOTH_TIME, limit=LIMIT)
+    expected = preprocess(field.copy(), *parameters)
+
+    result = preprocess_chunked(field, np.empty(field.shape), *parameters, chunk_size=5000, sample=20_000)
+
+    bins, norm_quantiles, _ = parameters
+    if bins == 1 and not norm_quantiles:
+        np.testing.assert_array_equal(result, expected)
+        return
+
+    # The quantiles around 0 can put a few small escape times on the other side
+    same_sign = (result < 0) == (expected < 0)
+    assert same_sign.mean() > 0.9999
+    # The values are colored modulo 1, where the largest one is also the smallest
+    difference = np.abs(result - expected)[same_sign] % 1
+    difference = np.minimum(difference, 1 - difference)
+    assert difference.mean() < 0.003
+    assert np.quantile(difference, 0.999) < 0.02
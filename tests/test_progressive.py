@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from brocoli.processing import progressive
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, compute
+from brocoli.processing.progressive import compute_progressive
+
+# Not a multiple of the coarsest grid, so the last cells are cut
+SIZE = (61, 45)
+LIMIT = 100
+KINDS = list(Coloration)
+
+
+@pytest.fixture
+def iterations(monkeypatch):
+    """Count how many times each pixel of the view is computed by the passes."""
+
+    counts = np.zeros(SIZE, dtype=int)
+    compute_pass = progressive._compute_pass
+
+    def counting_pass(out, *args):
+        # The pixels computed by this pass are the ones that are not NaN anymore
+        computed = np.full(out.shape, np.nan)
+        compute_pass(computed, *args)
+        written = ~np.isnan(computed)
+        counts[written] += 1
+        out[written] = computed[written]
+
+    monkeypatch.setattr(progressive, "_compute_pass", counting_pass)
+    return counts
+
+
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+@pytest.mark.parametrize("kind", KINDS, ids=[kind.name for kind in KINDS])
+def test_last_pass_is_compute(kind, julia):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    passes = [fractal.copy() for fractal in compute_progressive(camera, kind, limit=LIMIT, julia=julia)]
+
+    # 8, 4, 2 and 1
+    assert len(passes) == 4
+    np.testing.assert_array_equal(passes[-1], compute(camera, kind, limit=LIMIT, julia=julia))
+
+
+def test_first_pass_is_coarse():
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    first = next(compute_progressive(camera, Coloration.SMOOTH_TIME, limit=LIMIT, coarsest=4))
+    expected = compute(camera, Coloration.SMOOTH_TIME, limit=LIMIT)
+
+    # The computed pixels, and the cells of 4 x 4 pixels that copy them
+    np.testing.assert_array_equal(first[::4, ::4], expected[::4, ::4])
+    for dx in range(4):
+        for dy in range(4):
+            cell = first[dx::4, dy::4]
+            np.testing.assert_array_equal(cell, first[::4, ::4][: cell.shape[0], : cell.shape[1]])
+
+
+@pytest.mark.parametrize("coarsest", [1, 4, 16])
+@pytest.mark.parametrize("julia", [None, -0.8 + 0.156j], ids=["mandelbrot", "julia"])
+def test_every_pixel_is_computed_once(iterations, julia, coarsest):
+    camera = SimpleCamera(SIZE, -0.75 + 0.1j, 2.5)
+    *_, fractal = compute_progressive(camera, Coloration.SMOOTH_TIME, limit=LIMIT, julia=julia, coarsest=coarsest)
+
+    np.testing.assert_array_equal(iterations, 1)
+    np.testing.assert_array_equal(fractal, compute(camera, Coloration.SMOOTH_TIME, limit=LIMIT, julia=julia))
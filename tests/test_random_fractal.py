@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from brocoli.processing import random_fractal
+from brocoli.processing.random_fractal import border_mask, random_position
+
+
+@pytest.fixture
+def drawn_views(monkeypatch):
+    """Record the (center, height) of the views that random_position() draws."""
+
+    views = []
+    compute = random_fractal.compute
+
+    def record(camera, *args, **kwargs):
+        views.append((camera.center, camera.height))
+        return compute(camera, *args, **kwargs)
+
+    monkeypatch.setattr(random_fractal, "compute", record)
+    return views
+
+
+def test_back_off_on_the_last_iteration(drawn_views, monkeypatch):
+    monkeypatch.setattr(random_fractal.random, "randint", lambda a, b: 3)
+    # The border is lost on the last view
+    masks = iter([True, True, False])
+    monkeypatch.setattr(
+        random_fractal, "border_mask", lambda values: border_mask(values) & next(masks)
+    )
+
+    camera = random_position()
+
+    assert (camera.center, camera.height) == drawn_views[1]
+    assert np.isclose(camera.height, 1)
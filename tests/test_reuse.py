@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import CONSTANT_INSIDE_KINDS, Coloration, compute
+from brocoli.processing.reuse import ViewCache
+
+SIZE = (64, 48)
+LIMIT = 100
+
+
+def pan(camera: SimpleCamera):
+    """The camera moved by a whole number of pixels."""
+
+    moved = SimpleCamera(camera.size, camera.center, camera.height)
+    moved.move(camera.offset_at((camera.size[0] / 2 + 7, camera.size[1] / 2 - 5)))
+    return moved
+
+
+def zoom(factor):
+    """A move that zooms by the factor on a pixel, like SimpleCamera.zoom()."""
+
+    def move(camera: SimpleCamera):
+        zoomed = SimpleCamera(camera.size, camera.center, camera.height * factor)
+        zoomed.move(camera.offset_at((20, 14)) * (1 - factor))
+        return zoomed
+
+    return move
+
+
+MOVES = {"pan": pan, "zoom in": zoom(0.5), "zoom out": zoom(2)}
+# (center, height) of the first view
+VIEWS = {"wide": (-0.75 + 0.1j, 2.5), "zoomed": (-0.7436 + 0.1318j, 0.02)}
+# Share of the view that each move reuses at least in exact mode, where only
+# some of the samples round the same, and by default, on the kinds in
+# CONSTANT_INSIDE_KINDS: most of a pan and a quarter of a 2x zoom
+MIN_REUSED_EXACT = {"pan": 0.1, "zoom in": 0.02, "zoom out": 0.03}
+MIN_REUSED = {"pan": 0.75, "zoom in": 0.25, "zoom out": 0.25}
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("move", MOVES.keys())
+@pytest.mark.parametrize("kind", list(Coloration), ids=[kind.name for kind in Coloration])
+def test_exact_render_is_compute(kind, move, view):
+    views = ViewCache(exact=True)
+    camera = SimpleCamera(SIZE, *view)
+    views.render(camera, kind, limit=LIMIT)
+
+    camera = MOVES[move](camera)
+    assert views.can_reuse(camera, kind=kind, limit=LIMIT)
+    fractal = views.render(camera, kind, limit=LIMIT)
+
+    assert views.reused >= MIN_REUSED_EXACT[move] * fractal.size
+    np.testing.assert_array_equal(fractal, compute(camera, kind, limit=LIMIT))
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("move", MOVES.keys())
+@pytest.mark.parametrize("kind", list(Coloration), ids=[kind.name for kind in Coloration])
+def test_default_render(kind, move, view):
+    views = ViewCache()
+    camera = SimpleCamera(SIZE, *view)
+    views.render(camera, kind, limit=LIMIT)
+
+    camera = MOVES[move](camera)
+    fractal = views.render(camera, kind, limit=LIMIT)
+    expected = compute(camera, kind, limit=LIMIT)
+
+    if kind not in CONSTANT_INSIDE_KINDS:
+        # Exact, since the chaotic orbits inside would amplify the rounding
+        assert views.reused >= MIN_REUSED_EXACT[move] * fractal.size
+        np.testing.assert_array_equal(fractal, expected)
+        return
+
+    assert views.reused >= MIN_REUSED[move] * fractal.size
+    # Only the reused pixels outside the set differ, by the rounding of their sample point
+    np.testing.assert_array_equal(fractal < 0, expected < 0)
+    np.testing.assert_array_equal(fractal[expected < 0], expected[expected < 0])
+    np.testing.assert_allclose(fractal, expected, rtol=1e-8, atol=0)
+    if kind is Coloration.TIME:
+        np.testing.assert_array_equal(fractal, expected)
+
+
+def test_other_parameters_are_not_reused():
+    views = ViewCache(exact=True)
+    camera = SimpleCamera(SIZE, -0.75, 2.5)
+    views.render(camera, Coloration.TIME, limit=LIMIT)
+
+    camera = pan(camera)
+    assert not views.can_reuse(camera, kind=Coloration.TIME, limit=2 * LIMIT)
+    assert not views.can_reuse(camera, kind=Coloration.SMOOTH_TIME, limit=LIMIT)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import CONSTANT_INSIDE_KINDS, Coloration, Engine, compute, connected_julia
+
+SIZE = (128, 96)
+LIMIT = 200
+
+# (center, height, julia)
+VIEWS = {
+    "mandelbrot": (-0.75, 2.5, None),
+    "seahorse valley": (-0.7436 + 0.1318j, 0.01, None),
+    "period-2 bulb": (-1.25 + 0.05j, 0.2, None),
+    "douady rabbit": (0, 3, -0.123 + 0.745j),
+    "julia on the border": (0, 3, -0.8 + 0.156j),
+    "julia zoom": (0.1 + 0.1j, 0.5, 0.3 + 0.5j),
+    # Seeds far outside the set, whose Julia sets are dust: whole tiles are in
+    # regions of constant escape time surrounding islands of higher times
+    "julia dust": (5, 40, 3),
+    "julia dust zoom": (1.7j, 5, 10j),
+}
+
+
+@pytest.mark.parametrize("view", VIEWS.values(), ids=VIEWS.keys())
+@pytest.mark.parametrize("kind", sorted(CONSTANT_INSIDE_KINDS, key=lambda kind: kind.name), ids=lambda kind: kind.name)
+def test_subdivision_is_tiles(kind, view):
+    center, height, julia = view
+    camera = SimpleCamera(SIZE, center, height)
+
+    np.testing.assert_array_equal(
+        compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.SUBDIVISION),
+        compute(camera, kind, limit=LIMIT, julia=julia, engine=Engine.TILES),
+    )
+
+
+def test_connected_julia():
+    assert connected_julia(-0.123 + 0.745j, LIMIT)
+    assert connected_julia(-1, LIMIT)
+    assert not connected_julia(3, LIMIT)
+    assert not connected_julia(-0.4 + 0.6j, LIMIT)
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from click.testing import CliRunner
+from numba import njit
+
+from brocoli.brocoli import cli
+from brocoli.processing.compute import (
+    ESCAPE_FUNCTIONS,
+    PERIODIC_ESCAPE_FUNCTIONS,
+    Coloration,
+    set_identity,
+    source_fingerprint,
+    warmup,
+)
+
+# Render a small view in a new process, and print whether _compute was loaded
+# from the disk cache
+RENDER = """
+from brocoli.processing.camera import SimpleCamera
+from brocoli.processing.compute import Coloration, Engine, _compute, compute
+
+compute(SimpleCamera((8, 8)), Coloration.SMOOTH_TIME, engine=Engine.TILES)
+print(sum(_compute.stats.cache_hits.values()), sum(_compute.stats.cache_misses.values()))
+"""
+
+
+def test_warmup_compiles_every_kernel():
+    times = warmup()
+
+    expected = {
+        (kind, julia, periodicity)
+        for kind in Coloration
+        for julia in (False, True)
+        for periodicity in (False, kind in PERIODIC_ESCAPE_FUNCTIONS)
+    }
+    assert {(kind, julia, periodicity) for kind, julia, periodicity, _, _ in times} == expected
+    assert len(times) == len(expected)
+    assert all(cold >= 0 and warm >= 0 for *_, cold, warm in times)
+
+
+def test_warmup_command():
+    result = CliRunner().invoke(cli, ["warmup"])
+
+    assert result.exit_code == 0, result.output
+    for kind in Coloration:
+        assert kind.value in result.output
+    assert "Total:" in result.output
+
+
+def test_identities_change_with_the_sources():
+    fingerprint = source_fingerprint()
+    for kind, func in ESCAPE_FUNCTIONS.items():
+        assert func._uuid == f"brocoli.escape.{kind.name}.{fingerprint}"
+
+
+def test_identity_is_only_set_once():
+    func = njit(lambda z: z)
+    assert set_identity(func, "brocoli.test.identity")
+    assert not set_identity(func, "brocoli.test.other")
+    assert func._uuid == "brocoli.test.identity"
+    # A python function has no identity
+    assert not set_identity(lambda z: z, "brocoli.test.python")
+
+
+def test_kernels_are_loaded_from_the_cache(tmp_path):
+    env = dict(os.environ, NUMBA_CACHE_DIR=str(tmp_path))
+    root = Path(__file__).parent.parent
+
+    def render():
+        output = subprocess.run(
+            [sys.executable, "-c", RENDER], cwd=root, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        return tuple(map(int, output.split()))
+
+    assert render() == (0, 1)
+    assert render() == (1, 0)